@@ -0,0 +1,95 @@
+"""Local stand-in for the parts of the YouTube Data API v3 the api backend uses"""
+
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+class DataAPIStub:
+    """Serve videos.list, channels.list and videoCategories.list from dicts
+
+    videos maps video IDs to videos.list items, channels maps channel IDs
+    to channels.list items and categories category IDs to titles. Every
+    request is kept in requests as (resource, params). Like the real API,
+    maxResults cannot be combined with id.
+    """
+
+    def __init__(self, videos=None, channels=None, categories=None):
+        self.videos = videos or {}
+        self.channels = channels or {}
+        self.categories = categories or {}
+        self.requests = []
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler())
+        self._thread = threading.Thread(target=self._server.serve_forever, kwargs={'poll_interval': 0.05},
+                                        daemon=True)
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self._server.server_port}/youtube/v3"
+
+    def calls(self, resource):
+        return [params for name, params in self.requests if name == resource]
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                resource = url.path.rsplit('/', 1)[-1]
+                params = {name: values[0] for name, values in parse_qs(url.query).items()}
+                stub.requests.append((resource, params))
+                table = {'videos': stub.videos, 'channels': stub.channels,
+                         'videoCategories': stub.categories}.get(resource)
+                if table is None or 'maxResults' in params and 'id' in params or 'key' not in params:
+                    self.reply(400, {'error': {'code': 400, 'message': "Bad request"}})
+                    return
+                ids = params.get('id', '').split(',')
+                if resource == 'videoCategories':
+                    items = [{'id': i, 'snippet': {'title': table[i]}} for i in ids if i in table]
+                else:
+                    items = [table[i] for i in ids if i in table]
+                self.reply(200, {'items': items})
+
+            def reply(self, status, body):
+                data = json.dumps(body).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        return Handler
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def video_item(video_id, channel_id="UCchannel00000000000000A", category_id="28", **statistics):
+    return {
+        'id': video_id,
+        'snippet': {
+            'title': f"Title {video_id}", 'channelId': channel_id, 'channelTitle': f"Channel {channel_id}",
+            'description': "Desc #ai #ml", 'publishedAt': "2025-06-28T10:00:00Z", 'categoryId': category_id,
+            'thumbnails': {'high': {'url': f"https://i.ytimg.com/vi/{video_id}/hqdefault.jpg"},
+                           'maxres': {'url': f"https://i.ytimg.com/vi/{video_id}/maxresdefault.jpg"}},
+        },
+        'contentDetails': {'duration': "PT11M46S"},
+        'statistics': {'viewCount': "9157", 'likeCount': "390", 'commentCount': "39", **statistics},
+    }
+
+
+def channel_item(channel_id, subscribers="26600", hidden=False):
+    statistics = {'hiddenSubscriberCount': hidden}
+    if not hidden:
+        statistics['subscriberCount'] = subscribers
+    return {'id': channel_id, 'statistics': statistics}
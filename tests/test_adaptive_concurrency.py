@@ -0,0 +1,50 @@
+import pytest
+
+import youtube_notes_fixed as notes
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(notes.time, 'monotonic', lambda: now[0])
+    return now
+
+
+def run(limiter, clock, outcomes):
+    """Complete one 10 ms extraction per outcome, one after the other"""
+    for kind in outcomes:
+        clock[0] += 0.01
+        started = limiter.acquire()
+        clock[0] += 0.01
+        limiter.release(started, kind)
+
+
+def test_one_transient_failure_does_not_halve_the_limit(clock):
+    limiter = notes.AdaptiveConcurrency(initial=8, maximum=32)
+    run(limiter, clock, [notes.TRANSIENT] + [None] * 7)
+    assert limiter.limit == 8
+
+
+def test_background_errors_let_the_limit_reach_the_maximum(clock):
+    limiter = notes.AdaptiveConcurrency(initial=4, maximum=32)
+    # One transient failure in every 20 extractions (5%)
+    run(limiter, clock, ([notes.TRANSIENT] + [None] * 19) * 150)
+
+    assert limiter.limit == 32
+    assert not [reason for _, _, reason in limiter.history if 'failed' in reason]
+
+
+def test_sustained_errors_halve_the_limit(clock):
+    limiter = notes.AdaptiveConcurrency(initial=16, maximum=32)
+    run(limiter, clock, ([notes.TRANSIENT] * 3 + [None] * 7) * 4)
+
+    assert limiter.limit == 8
+    assert limiter.history[-1][2] == "11/32 failed"
+    # Halved once, without growing while the failures piled up
+    assert [limit for _, limit, _ in limiter.history] == [16, 8]
+
+
+def test_throttling_halves_the_limit_at_once(clock):
+    limiter = notes.AdaptiveConcurrency(initial=16, maximum=32)
+    run(limiter, clock, [notes.THROTTLED])
+    assert limiter.limit == 8
@@ -0,0 +1,21 @@
+import pytest
+
+import youtube_notes_fixed as notes
+
+
+@pytest.mark.parametrize('message', [
+    "Sign in to confirm you’re not a bot",
+    "Sign in to confirm you're not a bot",
+    "HTTP Error 429: Too Many Requests",
+])
+def test_throttling_is_recognised(message):
+    assert notes.classify_error(Exception(message)) == notes.THROTTLED
+
+
+@pytest.mark.parametrize('message, kind', [
+    ("The read operation timed out", notes.TRANSIENT),
+    ("HTTP Error 503: Service Unavailable", notes.TRANSIENT),
+    ("Video unavailable. This video is private", notes.PERMANENT),
+])
+def test_other_failures_are_classified(message, kind):
+    assert notes.classify_error(Exception(message)) == kind
@@ -0,0 +1,144 @@
+import contextlib
+import datetime
+import os
+import subprocess
+import sys
+
+import pytest
+
+import youtube_notes_fixed as notes
+from data_api_stub import DataAPIStub, channel_item, video_item
+
+CHANNEL = "UCchannel00000000000000A"
+HIDDEN = "UChidden000000000000000A"
+
+
+def video_ids(count, start=0):
+    return [f"vid{i:07d}A" for i in range(start, start + count)]
+
+
+@pytest.fixture
+def stub():
+    videos = {video_id: video_item(video_id) for video_id in video_ids(120)}
+    videos['hidden00000'] = video_item('hidden00000', channel_id=HIDDEN, category_id="10")
+    channels = {CHANNEL: channel_item(CHANNEL), HIDDEN: channel_item(HIDDEN, hidden=True)}
+    with DataAPIStub(videos, channels, {'28': "Science & Technology", '10': "Music"}) as stub:
+        yield stub
+
+
+@pytest.fixture
+def quota(tmp_path):
+    quota = notes.QuotaLedger(str(tmp_path / "quota.sqlite"), daily_limit=100)
+    yield quota
+    quota.close()
+
+
+def test_fetch_many_requests_50_ids_at_a_time(stub, quota):
+    backend = notes.DataAPIBackend("key", base_url=stub.url, quota=quota)
+    infos = backend.fetch_many(video_ids(120))
+
+    assert sorted(infos) == video_ids(120)
+    assert [len(params['id'].split(',')) for params in stub.calls('videos')] == [50, 50, 20]
+    # Channels and categories are looked up once and remembered
+    assert len(stub.calls('channels')) == 1
+    assert len(stub.calls('videoCategories')) == 1
+    assert all('maxResults' not in params for _, params in stub.requests)
+    assert quota.used() == len(stub.requests) == 5
+
+
+def test_items_are_mapped_onto_records(stub):
+    backend = notes.DataAPIBackend("key", base_url=stub.url)
+    record = backend.fetch_many(["vid0000001A"])["vid0000001A"]
+
+    assert record.title == "Title vid0000001A"
+    assert record.channel_name == f"Channel {CHANNEL}"
+    assert record.channel_url == f"https://www.youtube.com/channel/{CHANNEL}"
+    assert record.thumbnail_url == "https://i.ytimg.com/vi/vid0000001A/maxresdefault.jpg"
+    assert record.publish_date == datetime.date(2025, 6, 28)
+    assert record.duration == datetime.timedelta(minutes=11, seconds=46)
+    assert record.category == "Science & Technology"
+    assert (record.views, record.likes, record.comments, record.channel_subscribers) == (9157, 390, 39, 26600)
+    assert record.hashtags == ['#ai', '#ml']
+
+
+def test_hidden_subscriber_counts_are_unknown(stub):
+    backend = notes.DataAPIBackend("key", base_url=stub.url)
+    record = backend.fetch_many(["hidden00000"])["hidden00000"]
+
+    assert record.channel_subscribers is None
+    assert record.category == "Music"
+
+
+def test_missing_videos_are_left_out(stub):
+    backend = notes.DataAPIBackend("key", base_url=stub.url)
+    assert list(backend.fetch_many(["vid0000001A", "gone0000000"])) == ["vid0000001A"]
+    assert backend.fetch("https://youtu.be/gone0000000") is None
+
+
+def test_quota_ledger_refuses_to_go_over_the_daily_limit(tmp_path):
+    with contextlib.closing(notes.QuotaLedger(str(tmp_path / "quota.sqlite"), daily_limit=3)) as quota:
+        quota.spend(2)
+        with pytest.raises(notes.QuotaExceeded):
+            quota.spend(2)
+        quota.spend(1)
+        assert quota.used() == 3
+
+
+SPEND_SCRIPT = """
+import sys
+import youtube_notes_fixed as notes
+
+quota = notes.QuotaLedger(sys.argv[1], daily_limit=int(sys.argv[2]))
+spent = 0
+for _ in range(int(sys.argv[3])):
+    try:
+        quota.spend(1)
+        spent += 1
+    except notes.QuotaExceeded:
+        pass
+print(spent)
+"""
+
+
+@pytest.mark.parametrize('daily_limit, expected', [(10_000, 800), (500, 500)])
+def test_quota_ledger_is_shared_by_concurrent_processes(tmp_path, daily_limit, expected):
+    path = str(tmp_path / "quota.sqlite")
+    notes.QuotaLedger(path).close()
+    env = dict(os.environ, PYTHONPATH=os.path.dirname(os.path.abspath(notes.__file__)))
+    workers = [
+        subprocess.Popen([sys.executable, '-c', SPEND_SCRIPT, path, str(daily_limit), '200'],
+                         stdout=subprocess.PIPE, text=True, env=env)
+        for _ in range(4)
+    ]
+    spent = sum(int(worker.communicate(timeout=60)[0]) for worker in workers)
+    with contextlib.closing(notes.QuotaLedger(path, daily_limit=daily_limit)) as quota:
+        assert quota.used() == spent == expected
+
+
+def test_fetch_stops_asking_when_the_quota_is_used_up(stub, tmp_path):
+    quota = notes.QuotaLedger(str(tmp_path / "quota.sqlite"), daily_limit=1)
+    try:
+        backend = notes.DataAPIBackend("key", base_url=stub.url, quota=quota)
+        quota.spend(1)
+        assert backend.fetch("https://www.youtube.com/watch?v=vid0000001A") is None
+        assert stub.requests == []
+    finally:
+        quota.close()
+
+
+def test_prefetch_skips_cached_videos(stub, tmp_path):
+    backend = notes.DataAPIBackend("key", base_url=stub.url)
+    urls = [f"https://www.youtube.com/watch?v={video_id}" for video_id in video_ids(60)]
+    with notes.MetadataCache(str(tmp_path / "cache.sqlite")) as cache:
+        cached = backend.fetch_many(video_ids(10))
+        for video_id, record in cached.items():
+            cache.put(video_id, record)
+        stub.requests.clear()
+
+        assert list(backend.prefetch(urls, cache=cache)) == urls
+
+    requested = [video_id for params in stub.calls('videos') for video_id in params['id'].split(',')]
+    assert requested == video_ids(50, start=10)
+    # fetch() answers prefetched videos without another request
+    assert backend.fetch(urls[-1]).video_id == "vid0000059A"
+    assert len(stub.calls('videos')) == 2
@@ -0,0 +1,35 @@
+import asyncio
+import time
+
+import pytest
+
+import youtube_notes_fixed as notes
+
+SLOW_URL = "https://www.youtube.com/watch?v=aaaaaaaaaaA"
+WRITTEN_URLS = [
+    "https://www.youtube.com/watch?v=bbbbbbbbbbA",
+    "https://www.youtube.com/watch?v=ccccccccccA",
+]
+
+
+def slow_fetch(url):
+    time.sleep(0.5)
+    return None
+
+
+def test_cancelling_a_resumed_batch_propagates_the_cancellation(tmp_path):
+    journal_path = tmp_path / "batch.journal"
+    with notes.JobJournal(str(journal_path)) as journal:
+        for url in WRITTEN_URLS:
+            journal.record(url, 'written', sync=True)
+
+    async def run():
+        with notes.JobJournal(str(journal_path), resume=True) as journal:
+            task = asyncio.ensure_future(notes.ingest_batch(
+                [SLOW_URL] + WRITTEN_URLS, slow_fetch, filename=str(tmp_path / "notes.md"), journal=journal))
+            await asyncio.sleep(0.1)
+            task.cancel()
+            await task
+
+    with pytest.raises(asyncio.CancelledError):
+        asyncio.run(run())
@@ -0,0 +1,78 @@
+import gc
+import sys
+import tracemalloc
+import types
+
+import pytest
+
+import youtube_notes_fixed as notes
+
+VIDEOS = 20
+# What a kept VideoRecord may cost, against ~2 MB of raw info per video
+PER_VIDEO_CEILING = 16 * 1024
+
+
+def raw_info(video_id):
+    """A yt-dlp info dict with the bulky fields get_video_info never reads"""
+    return {
+        'id': video_id, 'title': f"Title {video_id}", 'uploader': "Chan",
+        'uploader_url': "https://www.youtube.com/@chan", 'description': "Desc #ai", 'upload_date': "20250628",
+        'duration': 706, 'view_count': 9157, 'like_count': 390, 'comment_count': 39,
+        'channel_follower_count': 26600, 'categories': ["Science & Technology"],
+        'formats': [{'url': f"https://rr1.googlevideo.com/{video_id}/{i}" + "x" * 2000, 'format_id': str(i)}
+                    for i in range(400)],
+        'thumbnails': [{'url': f"https://i.ytimg.com/vi/{video_id}/{i}.jpg"} for i in range(40)],
+        'automatic_captions': {f"lang{i}": [{'url': "y" * 500}] for i in range(200)},
+        'heatmap': [{'start_time': i, 'end_time': i + 1, 'value': 0.5} for i in range(1000)],
+    }
+
+
+class FakeSession:
+    def extract_info(self, url):
+        return raw_info(url.rsplit('=', 1)[-1])
+
+
+@pytest.fixture(autouse=True)
+def fake_yt_dlp(monkeypatch):
+    monkeypatch.setitem(sys.modules, 'yt_dlp', types.ModuleType('yt_dlp'))
+
+
+def measure(call):
+    call(0)  # warm up caches and interned strings
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        kept = [call(i) for i in range(1, VIDEOS + 1)]
+        gc.collect()
+        retained, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    assert all(kept)
+    return (retained - before) / VIDEOS, peak - before
+
+
+def tracemalloc_size(build):
+    tracemalloc.start()
+    try:
+        value = build()
+        size = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    del value
+    return size
+
+
+def test_project_raw_info_keeps_only_the_fields_used():
+    per_video, _ = measure(lambda i: notes.project_raw_info(raw_info(f"vid{i:07d}A")))
+    assert per_video < PER_VIDEO_CEILING
+
+
+def test_get_video_info_retains_a_small_record_per_video():
+    session = FakeSession()
+    raw_size = tracemalloc_size(lambda: raw_info("vid0000000A"))
+    per_video, peak = measure(lambda i: notes.get_video_info(f"https://www.youtube.com/watch?v=vid{i:07d}A",
+                                                             session=session))
+    assert per_video < PER_VIDEO_CEILING
+    # Only one raw dict is alive at a time
+    assert peak < 2 * raw_size
@@ -0,0 +1,157 @@
+import datetime
+import io
+import logging
+
+import pytest
+
+import youtube_notes_fixed as notes
+
+LEGACY_ENTRY = """# [Old video]
+
+<div style="display:flex">
+<div style="flex:40%">
+![Video Thumbnail](https://img.youtube.com/vi/oldoldoldoA/maxresdefault.jpg)
+</div>
+<div style="flex:60%">
+
+## Quick Facts
+- **Channel:** Plain Channel (Subscribers: 26.6K)
+- **Published:** 2023-01-05
+- **Captured:** 2023-02-01
+- **Duration:** 1:02:03
+- **Views:** 9157
+- **Likes:** Unknown
+- **Comments:** 1.2K
+- **Category:** Unknown
+- **Personal Rating:** 4/5
+
+</div>
+</div>
+
+## Description
+Old description
+
+## Hashtags
+#one #two
+
+## Link
+[Watch on YouTube](https://www.youtube.com/watch?v=oldoldoldoA)
+
+## Notes
+Worth rewatching
+
+---
+"""
+
+FALLBACK_ENTRY = """# [YouTube Video fallbackvdA]
+
+## Quick Facts
+- **Channel:** Unknown (Fallback Method) (Subscribers: Unknown)
+- **Published:** Unknown
+- **Captured:** 2024-03-03
+- **Duration:** Unknown
+- **Views:** 0
+- **Personal Rating:** [Add your rating]
+
+</div>
+
+## Description
+
+
+## Hashtags
+None
+
+## Link
+[Watch on YouTube](https://youtube.com/watch?v=fallbackvdA)
+
+## Notes
+[Add your personal notes about the video here]
+
+---
+"""
+
+
+def parse(text):
+    return list(notes.iter_note_records(io.BytesIO(text.encode('utf-8'))))
+
+
+@pytest.mark.parametrize('record', [
+    notes.VideoRecord(
+        video_id="qWm8yJ_mDAs", title="10 Pro Tips for AI Coding [2025] – Ünïcode",
+        channel_name="Chan", channel_url="https://www.youtube.com/@chan",
+        thumbnail_url="https://img.youtube.com/vi/qWm8yJ_mDAs/maxresdefault.jpg",
+        description="Line one #ai\n\n## Not a section\nLine three #coding",
+        publish_date=datetime.date(2025, 6, 28), capture_date=datetime.date(2025, 6, 30),
+        duration=datetime.timedelta(hours=1, minutes=2, seconds=3), category="Science & Technology",
+        views=1_234_567, likes=8_910, comments=11, channel_subscribers=1_500_000,
+    ),
+    # Unknown views are written as 0, so only a count of 0 survives the trip
+    notes.VideoRecord(video_id="aaaaaaaaaaA", title="Nothing known", capture_date=datetime.date(2025, 6, 30),
+                      views=0),
+])
+def test_rendered_records_parse_back_unchanged(record):
+    [entry] = parse(notes.format_for_markdown(record))
+
+    assert entry.record == record
+    assert entry.hashtags == record.hashtags
+    assert entry.notes is None and entry.rating is None and not entry.fallback
+
+
+def test_legacy_entries_are_read():
+    [entry] = parse(LEGACY_ENTRY)
+
+    assert entry.record == notes.VideoRecord(
+        video_id="oldoldoldoA", title="Old video", channel_name="Plain Channel",
+        thumbnail_url="https://img.youtube.com/vi/oldoldoldoA/maxresdefault.jpg", description="Old description",
+        publish_date=datetime.date(2023, 1, 5), capture_date=datetime.date(2023, 2, 1),
+        duration=datetime.timedelta(hours=1, minutes=2, seconds=3), views=9157, comments=1200,
+        channel_subscribers=26_600,
+    )
+    assert entry.hashtags == ["#one", "#two"]
+    assert entry.notes == "Worth rewatching" and entry.rating == "4/5"
+
+
+def test_fallback_entries_are_flagged():
+    [entry] = parse(FALLBACK_ENTRY)
+
+    assert entry.fallback
+    assert entry.record.channel_name is None and entry.record.publish_date is None
+    assert entry.record.capture_date == datetime.date(2024, 3, 3)
+    assert entry.hashtags == [] and entry.notes is None and entry.rating is None
+
+
+def test_entries_without_a_link_are_skipped_with_a_warning(caplog):
+    unlinked = LEGACY_ENTRY.replace("[Watch on YouTube](https://www.youtube.com/watch?v=oldoldoldoA)",
+                                    "A link I deleted")
+    text = FALLBACK_ENTRY + "\n" + unlinked + "\n" + LEGACY_ENTRY
+
+    with caplog.at_level(logging.WARNING):
+        entries = parse(text)
+
+    assert [entry.record.video_id for entry in entries] == ["fallbackvdA", "oldoldoldoA"]
+    line = FALLBACK_ENTRY.count("\n") + 2
+    assert f"Skipping the entry on line {line} of the notes (# [Old video])" in caplog.text
+    assert "no Watch on YouTube link" in caplog.text
+
+
+def test_cut_off_entries_are_skipped_with_a_warning(caplog):
+    cut_off = LEGACY_ENTRY[:LEGACY_ENTRY.index("## Description")]
+    with caplog.at_level(logging.WARNING):
+        entries = parse(cut_off + FALLBACK_ENTRY + "\n" + cut_off)
+
+    assert [entry.record.video_id for entry in entries] == ["fallbackvdA"]
+    messages = [record.getMessage() for record in caplog.records]
+    assert any("line 1 " in message and "before its Notes section" in message for message in messages)
+    assert any("does not end with a '---' line" in message for message in messages)
+
+
+def test_import_skips_damaged_entries(tmp_path, caplog):
+    path = tmp_path / "notes.md"
+    path.write_text(LEGACY_ENTRY.replace("](https://www.youtube.com/watch?v=oldoldoldoA)", "]") + "\n"
+                    + FALLBACK_ENTRY, encoding='utf-8')
+
+    with notes.RecordStore(str(tmp_path / "records.sqlite")) as store, caplog.at_level(logging.WARNING):
+        assert notes.import_notes(store, str(path)) == (1, 0)
+        assert store.get("fallbackvdA") is not None
+
+    assert f"line 1 of {path}" in caplog.text
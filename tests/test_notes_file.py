@@ -0,0 +1,186 @@
+import datetime
+import os
+import sqlite3
+import subprocess
+import sys
+
+import pytest
+
+import youtube_notes_fixed as notes
+
+VIDEO_IDS = ("aaaaaaaaaaA", "bbbbbbbbbbA", "ccccccccccA")
+
+
+def make_record(video_id, **fields):
+    values = dict(
+        video_id=video_id, title=f"Video {video_id}", channel_name="Chan", description="A description #ai",
+        publish_date=datetime.date(2025, 6, 28), capture_date=datetime.date(2025, 6, 30),
+        duration=datetime.timedelta(seconds=706), views=9157, likes=120,
+    )
+    values.update(fields)
+    return notes.VideoRecord(**values)
+
+
+def entry_bytes(path, index, video_id):
+    offset, length, _ = index.lookup(video_id)
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        return f.read(length)
+
+
+@pytest.fixture
+def notes_file(tmp_path):
+    """A notes file with three entries, the user's notes filled into the middle one"""
+    path = tmp_path / "notes.md"
+    with notes.NotesIndex(str(path)) as index:
+        for video_id in VIDEO_IDS:
+            assert notes.write_entry(make_record(video_id), str(path), index=index)[0]
+    text = path.read_text(encoding='utf-8')
+    start, end = text.index("# [Video bbbbbbbbbbA]"), text.index("# [Video ccccccccccA]")
+    middle = text[start:end].replace("[Add your rating]", "★★★★").replace(notes.NOTES_PLACEHOLDER,
+                                                                          "Ünïcode notes, keep me")
+    path.write_text(text[:start] + middle + text[end:], encoding='utf-8')
+    with notes.NotesIndex(str(path)) as index:
+        index.rebuild()
+    return path
+
+
+def update(path, record):
+    with notes.NotesIndex(str(path)) as index:
+        before = {video_id: (index.lookup(video_id), entry_bytes(path, index, video_id)) for video_id in VIDEO_IDS}
+        assert notes.update_entry(record, str(path), index)
+        after = {video_id: (index.lookup(video_id), entry_bytes(path, index, video_id)) for video_id in VIDEO_IDS}
+        assert not index.is_stale()
+        # What was indexed incrementally is what a full rebuild finds
+        incremental = index.conn.execute("SELECT * FROM entries ORDER BY offset").fetchall()
+        index.rebuild()
+        assert index.conn.execute("SELECT * FROM entries ORDER BY offset").fetchall() == incremental
+    return before, after
+
+
+def test_shorter_quick_facts_are_rewritten_in_place(notes_file):
+    size = notes_file.stat().st_size
+    before, after = update(notes_file, make_record("bbbbbbbbbbA", views=5, likes=None))
+
+    assert notes_file.stat().st_size == size
+    assert after["aaaaaaaaaaA"] == before["aaaaaaaaaaA"]
+    assert after["ccccccccccA"] == before["ccccccccccA"]
+
+    entry = after["bbbbbbbbbbA"][1].decode('utf-8')
+    assert "- **Views:** 5\n" in entry and "- **Likes:** Unknown\n" in entry
+    assert "- **Personal Rating:** ★★★★\n" in entry and "Ünïcode notes, keep me" in entry
+    # Outside the Quick Facts the entry is unchanged
+    old_entry = before["bbbbbbbbbbA"][1].decode('utf-8')
+    assert entry[:entry.index("## Quick Facts")] == old_entry[:old_entry.index("## Quick Facts")]
+    assert entry[entry.index("\n</div>", entry.index("## Quick Facts")):] == \
+        old_entry[old_entry.index("\n</div>", old_entry.index("## Quick Facts")):]
+
+
+def test_longer_quick_facts_are_spliced_and_later_entries_move(notes_file):
+    size = notes_file.stat().st_size
+    before, after = update(notes_file, make_record("bbbbbbbbbbA", views=1_234_567_890, likes=98_765_432,
+                                                   comments=4_321, category="Science & Technology"))
+
+    growth = notes_file.stat().st_size - size
+    assert growth > notes.QUICK_FACTS_SLACK
+    assert after["aaaaaaaaaaA"] == before["aaaaaaaaaaA"]
+    (offset, length, digest), data = before["ccccccccccA"]
+    assert after["ccccccccccA"] == ((offset + growth, length, digest), data)
+    assert after["bbbbbbbbbbA"][0][1] == before["bbbbbbbbbbA"][0][1] + growth
+
+    entry = after["bbbbbbbbbbA"][1].decode('utf-8')
+    assert "- **Views:** 1,234,567,890\n" in entry and "- **Category:** Science & Technology\n" in entry
+    assert "- **Personal Rating:** ★★★★\n" in entry and "Ünïcode notes, keep me" in entry
+
+
+def test_next_refresh_fits_in_the_slack_left_by_a_splice(notes_file):
+    update(notes_file, make_record("bbbbbbbbbbA", views=1_234_567_890, likes=98_765_432))
+    size = notes_file.stat().st_size
+
+    before, after = update(notes_file, make_record("bbbbbbbbbbA", views=1_234_567_891, likes=98_765_433))
+
+    assert notes_file.stat().st_size == size
+    assert after["ccccccccccA"] == before["ccccccccccA"]
+    assert "- **Views:** 1,234,567,891\n" in after["bbbbbbbbbbA"][1].decode('utf-8')
+
+
+def test_updating_an_unknown_video_leaves_the_file_alone(notes_file):
+    data = notes_file.read_bytes()
+    with notes.NotesIndex(str(notes_file)) as index:
+        assert not notes.update_entry(make_record("ddddddddddA"), str(notes_file), index)
+    assert notes_file.read_bytes() == data
+
+
+def test_missing_index_is_rebuilt(notes_file):
+    with notes.NotesIndex(str(notes_file)) as index:
+        expected = {video_id: index.lookup(video_id) for video_id in VIDEO_IDS}
+    (notes_file.parent / "notes.md.idx").unlink()
+
+    with notes.NotesIndex(str(notes_file)) as index:
+        assert index.is_stale()
+        assert {video_id: index.lookup(video_id) for video_id in VIDEO_IDS} == expected
+        assert not index.is_stale()
+
+
+def test_lookup_follows_an_external_edit(notes_file):
+    with notes.NotesIndex(str(notes_file)) as index:
+        old = index.lookup("ccccccccccA")
+        header = "# My video notes\n\n".encode('utf-8')
+        notes_file.write_bytes(header + notes_file.read_bytes())
+
+        assert index.is_stale()
+        assert index.lookup("ccccccccccA") == (old[0] + len(header), old[1], old[2])
+        assert index.read_entry("ccccccccccA").startswith("# [Video ccccccccccA]")
+
+
+def test_same_size_edit_is_noticed_by_its_mtime(notes_file):
+    with notes.NotesIndex(str(notes_file)) as index:
+        index.lookup("aaaaaaaaaaA")
+        stat = notes_file.stat()
+        notes_file.write_bytes(notes_file.read_bytes().replace(b"# [Video aaaaaaaaaaA]", b"# [Titled aaaaaaaaaA]"))
+        os.utime(notes_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+        assert notes_file.stat().st_size == stat.st_size
+
+        assert index.is_stale()
+        assert index.read_entry("aaaaaaaaaaA").startswith("# [Titled aaaaaaaaaA]")
+
+
+def test_writers_hold_an_immediate_transaction(notes_file):
+    with notes.NotesIndex(str(notes_file)) as index, notes.NotesIndex(str(notes_file)) as other:
+        other.conn.execute("PRAGMA busy_timeout=0")
+        with index.locked():
+            with pytest.raises(sqlite3.OperationalError, match="locked"):
+                other.conn.execute("BEGIN IMMEDIATE")
+            # Nested use shares the outer transaction
+            with index.locked():
+                index.lookup("aaaaaaaaaaA")
+        location = index.lookup("aaaaaaaaaaA")
+        with other.locked():
+            assert other.lookup("aaaaaaaaaaA") == location
+
+
+APPEND_SCRIPT = """
+import datetime
+import sys
+import youtube_notes_fixed as notes
+
+with notes.NotesIndex(sys.argv[1]) as index:
+    for i in range(int(sys.argv[3])):
+        record = notes.VideoRecord(video_id=f"{sys.argv[2]}{i:03d}A", title=f"Video {i}",
+                                   capture_date=datetime.date(2025, 6, 30))
+        assert notes.write_entry(record, sys.argv[1], index=index)[0]
+"""
+
+
+def test_concurrent_processes_append_through_the_index(tmp_path):
+    path = str(tmp_path / "notes.md")
+    env = dict(os.environ, PYTHONPATH=os.path.dirname(os.path.abspath(notes.__file__)))
+    writers = [subprocess.Popen([sys.executable, '-c', APPEND_SCRIPT, path, prefix * 7, '25'], env=env)
+               for prefix in "defg"]
+    assert [writer.wait(timeout=60) for writer in writers] == [0] * 4
+
+    with notes.NotesIndex(path) as index, open(path, 'rb') as f:
+        assert not index.is_stale()
+        incremental = index.conn.execute("SELECT * FROM entries ORDER BY offset").fetchall()
+        assert len(incremental) == 100
+        assert [row[:3] for row in notes.iter_note_entries(f)] == [row[:3] for row in incremental]
@@ -0,0 +1,110 @@
+import dataclasses
+import datetime
+
+import pytest
+
+import youtube_notes_fixed as notes
+
+
+def make_record(video_id="aaaaaaaaaaA", **fields):
+    values = dict(
+        video_id=video_id, title="Original title", channel_name="Chan", description="First description #ai",
+        publish_date=datetime.date(2025, 6, 28), capture_date=datetime.date(2025, 6, 30),
+        duration=datetime.timedelta(seconds=706), views=9157,
+    )
+    values.update(fields)
+    return notes.VideoRecord(**values)
+
+
+def write(record, path, index, store):
+    success, _ = notes.write_entry(record, str(path), index=index, store=store)
+    assert success
+
+
+def test_render_is_a_no_op_right_after_appending(tmp_path):
+    path = tmp_path / "notes.md"
+    with notes.NotesIndex(str(path)) as index, notes.RecordStore(str(tmp_path / "records.sqlite")) as store:
+        write(make_record(), path, index, store)
+        write(make_record("bbbbbbbbbbA", title="Other video"), path, index, store)
+        before = path.read_bytes()
+
+        assert notes.regenerate_notes(store, str(path), index=index) == (0, 0, 2)
+        assert path.read_bytes() == before
+
+
+def test_render_brings_an_updated_entry_up_to_date_and_keeps_the_notes(tmp_path):
+    path = tmp_path / "notes.md"
+    with notes.NotesIndex(str(path)) as index, notes.RecordStore(str(tmp_path / "records.sqlite")) as store:
+        write(make_record(), path, index, store)
+        write(make_record("bbbbbbbbbbA", title="Other video"), path, index, store)
+        path.write_text(path.read_text().replace(notes.NOTES_PLACEHOLDER, "My own notes", 1))
+
+        # Submitting the video again only refreshes its Quick Facts...
+        write(make_record(title="New title", description="New description #ml", views=10000), path, index, store)
+        assert "Original title" in path.read_text()
+
+        # ...so render still has work to do
+        assert notes.regenerate_notes(store, str(path), index=index) == (1, 0, 1)
+        text = path.read_text()
+        assert "# [New title]" in text and "New description #ml" in text and "#ml" in text
+        assert "Original title" not in text
+        assert "My own notes" in text
+        assert notes.regenerate_notes(store, str(path), index=index) == (0, 0, 2)
+
+
+def test_store_keeps_the_first_capture_date(tmp_path):
+    with notes.RecordStore(str(tmp_path / "records.sqlite")) as store:
+        store.put(make_record())
+        store.put(dataclasses.replace(make_record(), capture_date=datetime.date(2026, 1, 1)))
+        assert store.get("aaaaaaaaaaA").capture_date == datetime.date(2025, 6, 30)
+
+
+@pytest.fixture
+def replaced(monkeypatch):
+    """Count the files swapped in with os.replace, i.e. whole-file rewrites"""
+    calls = []
+    replace = notes.os.replace
+    monkeypatch.setattr(notes.os, 'replace', lambda src, dst: (calls.append(dst), replace(src, dst)))
+    return calls
+
+
+def entry_bytes(path, index, video_id):
+    offset, length, _ = index.lookup(video_id)
+    return path.read_bytes()[offset:offset + length]
+
+
+def test_render_patches_a_few_refreshed_statistics_in_place(tmp_path, replaced):
+    path = tmp_path / "notes.md"
+    with notes.NotesIndex(str(path)) as index, notes.RecordStore(str(tmp_path / "records.sqlite")) as store:
+        for video_id in ("aaaaaaaaaaA", "bbbbbbbbbbA", "ccccccccccA"):
+            write(make_record(video_id), path, index, store)
+        others = {video_id: entry_bytes(path, index, video_id) for video_id in ("aaaaaaaaaaA", "ccccccccccA")}
+
+        store.put(make_record("bbbbbbbbbbA", views=1234, likes=42))
+        store.put(make_record("ddddddddddA", title="New video"))
+        assert notes.regenerate_notes(store, str(path), index=index) == (1, 1, 2)
+
+        assert replaced == []
+        assert {video_id: entry_bytes(path, index, video_id) for video_id in others} == others
+        with open(path, 'rb') as f:
+            assert [entry.record for entry in notes.iter_note_records(f)] == [
+                record for record, _ in store.records()]
+        assert notes.regenerate_notes(store, str(path), index=index) == (0, 0, 4)
+
+
+def test_render_rewrites_the_file_for_other_changes_or_many_entries(tmp_path, replaced, monkeypatch):
+    path = tmp_path / "notes.md"
+    with notes.NotesIndex(str(path)) as index, notes.RecordStore(str(tmp_path / "records.sqlite")) as store:
+        for video_id in ("aaaaaaaaaaA", "bbbbbbbbbbA", "ccccccccccA"):
+            write(make_record(video_id), path, index, store)
+
+        store.put(make_record("bbbbbbbbbbA", description="A new description"))
+        assert notes.regenerate_notes(store, str(path), index=index) == (1, 0, 2)
+        assert len(replaced) == 1
+
+        monkeypatch.setattr(notes, 'RENDER_PATCH_LIMIT', 1)
+        store.put(make_record("aaaaaaaaaaA", views=1))
+        store.put(make_record("ccccccccccA", views=2))
+        assert notes.regenerate_notes(store, str(path), index=index) == (2, 0, 1)
+        assert len(replaced) == 2
+        assert "- **Views:** 2\n" in entry_bytes(path, index, "ccccccccccA").decode('utf-8')
@@ -0,0 +1,117 @@
+import datetime
+
+import youtube_notes_fixed as notes
+
+CAPTURED = datetime.date(2025, 6, 30)
+
+
+def complete(video_id, **fields):
+    values = dict(
+        video_id=video_id, title=f"Video {video_id}", channel_name="Some Channel", description="About #ai",
+        publish_date=datetime.date(2025, 6, 28), capture_date=CAPTURED,
+        duration=datetime.timedelta(seconds=706), views=9157, likes=120,
+    )
+    values.update(fields)
+    return notes.VideoRecord(**values)
+
+
+def incomplete(video_id):
+    return notes.VideoRecord(video_id=video_id, title=f"Video {video_id}", description="About #ai",
+                             capture_date=CAPTURED)
+
+
+def write_notes(path, records):
+    text = "\n".join(notes.format_for_markdown(record) for record in records)
+    # The user rated every entry, which a repair must keep
+    path.write_text(text.replace(notes.RATING_PLACEHOLDER, "5/5"), encoding='utf-8')
+
+
+def entries(path):
+    with open(path, 'rb') as f:
+        return [(video_id, data.decode('utf-8')) for video_id, _, data in notes.iter_note_blocks(f)]
+
+
+def outside_quick_facts(entry):
+    start, end = notes.quick_facts_span(entry)
+    return entry[:start], entry[end:]
+
+
+def quick_facts(entry):
+    start, end = notes.quick_facts_span(entry)
+    return [line for line in entry[start:end].split('\n') if line.startswith('- ')]
+
+
+class FakeFetch:
+    def __init__(self, records):
+        self.records = records
+        self.urls = []
+
+    def __call__(self, url):
+        self.urls.append(url)
+        return self.records.get(notes.parse_video_id(url))
+
+
+def test_only_the_quick_facts_of_incomplete_entries_change(tmp_path):
+    path = tmp_path / "notes.md"
+    write_notes(path, [
+        complete("aaaaaaaaaaA"),
+        incomplete("bbbbbbbbbbA"),  # grows, so the file is spliced
+        complete("ccccccccccA"),
+        incomplete("ddddddddddA"),  # shrinks, patched in place
+        incomplete("eeeeeeeeeeA"),  # cannot be fetched
+    ])
+    before = entries(path)
+    fetch = FakeFetch({
+        "bbbbbbbbbbA": complete("bbbbbbbbbbA", title="New title", channel_name="A Channel With A Long Name",
+                                views=1_234_567, likes=89_012, comments=345, category="Education",
+                                channel_subscribers=2_000_000, capture_date=datetime.date(2026, 1, 1)),
+        "ddddddddddA": complete("ddddddddddA", channel_name="X", views=5, likes=None,
+                                duration=datetime.timedelta(seconds=5)),
+    })
+
+    results = notes.repair_notes(fetch, str(path), workers=2)
+
+    assert sorted(fetch.urls) == [notes.WATCH_PAGE_URL.format(video_id=video_id)
+                                  for video_id in ("bbbbbbbbbbA", "ddddddddddA", "eeeeeeeeeeA")]
+    assert [success for _, success, _, _ in results] == [True, True, False]
+    after = entries(path)
+    assert [video_id for video_id, _ in after] == [video_id for video_id, _ in before]
+    unchanged = {"aaaaaaaaaaA", "ccccccccccA", "eeeeeeeeeeA"}
+    for (video_id, old), (_, new) in zip(before, after):
+        if video_id in unchanged:
+            assert new == old
+            continue
+        # Title, description and notes stay as they were, even where the record differs
+        assert outside_quick_facts(new) == outside_quick_facts(old)
+        facts = quick_facts(new)
+        assert "- **Personal Rating:** 5/5" in facts and "- **Captured:** 2025-06-30" in facts
+        assert not notes.missing_fields(notes.parse_note_entry(video_id, 0, new.encode('utf-8')).record)
+
+    facts = quick_facts(dict(after)["bbbbbbbbbbA"])
+    assert "- **Channel:** A Channel With A Long Name (Subscribers: 2000000)" in facts
+    assert "- **Views:** 1,234,567" in facts
+    assert "- **Channel:** X (Subscribers: Unknown)" in quick_facts(dict(after)["ddddddddddA"])
+
+
+def test_incomplete_entries_are_repaired_from_a_complete_copy(tmp_path):
+    path = tmp_path / "notes.md"
+    write_notes(path, [incomplete("aaaaaaaaaaA"), complete("bbbbbbbbbbA"), complete("aaaaaaaaaaA", views=42)])
+    fetch = FakeFetch({})
+
+    notes.repair_notes(fetch, str(path))
+
+    assert fetch.urls == []
+    assert "- **Views:** 42" in quick_facts(entries(path)[0][1])
+
+
+def test_complete_notes_are_left_byte_identical(tmp_path):
+    path = tmp_path / "notes.md"
+    write_notes(path, [complete("aaaaaaaaaaA"), complete("bbbbbbbbbbA")])
+    data, mtime = path.read_bytes(), path.stat().st_mtime_ns
+    fetch = FakeFetch({})
+
+    assert notes.repair_notes(fetch, str(path)) == []
+    assert notes.patch_quick_facts({"aaaaaaaaaaA": complete("aaaaaaaaaaA", views=1)}, str(path)) == 0
+
+    assert fetch.urls == []
+    assert path.read_bytes() == data and path.stat().st_mtime_ns == mtime
@@ -0,0 +1,101 @@
+import http.client
+import json
+import threading
+
+import pytest
+
+import youtube_notes_fixed as notes
+
+VIDEO_URL = "https://www.youtube.com/watch?v=qWm8yJ_mDAs"
+FAILING_URL = "https://www.youtube.com/watch?v=aaaaaaaaaaA"
+ALLOWED = "https://www.youtube.com"
+
+
+def fetch(url):
+    if url == FAILING_URL:
+        return None
+    return notes.VideoRecord(video_id=notes.parse_video_id(url), title="10 Pro Tips for AI Coding")
+
+
+@pytest.fixture
+def server(tmp_path):
+    with notes.NotesIndex(str(tmp_path / "notes.md")) as index:
+        queue = notes.NotesServer(fetch, index, filename=str(tmp_path / "notes.md"), workers=1)
+        server = notes.make_http_server(queue, port=0, wait_timeout=5, allowed_origins=[ALLOWED])
+        thread = threading.Thread(target=server.serve_forever, kwargs={'poll_interval': 0.05}, daemon=True)
+        thread.start()
+        yield server
+        server.shutdown()
+        server.server_close()
+
+
+def request(server, method, path, body=None, headers=None):
+    connection = http.client.HTTPConnection('127.0.0.1', server.server_port, timeout=10)
+    try:
+        connection.request(method, path, body=body, headers=headers or {})
+        response = connection.getresponse()
+        data = response.read()
+        return response.status, dict(response.getheaders()), json.loads(data) if data else None
+    finally:
+        connection.close()
+
+
+def test_other_web_pages_cannot_submit_or_read_jobs(server):
+    status, headers, _ = request(server, 'POST', '/jobs', VIDEO_URL, {'Origin': "https://evil.example"})
+    assert status == 403
+    assert 'Access-Control-Allow-Origin' not in headers
+    assert server.notes.queue.qsize() == 0 and not server.notes.jobs
+
+    status, _, _ = request(server, 'GET', '/health', headers={'Origin': "https://evil.example"})
+    assert status == 403
+
+
+def test_allowed_origin_gets_cors_headers(server):
+    status, headers, job = request(server, 'POST', '/jobs?wait=1', VIDEO_URL, {'Origin': ALLOWED})
+    assert status == 200 and job['status'] == 'done'
+    assert headers['Access-Control-Allow-Origin'] == ALLOWED
+
+    status, headers, _ = request(server, 'OPTIONS', '/jobs', headers={'Origin': ALLOWED})
+    assert status == 204 and headers['Access-Control-Allow-Origin'] == ALLOWED
+
+
+def test_requests_without_an_origin_are_accepted(server):
+    status, headers, job = request(server, 'POST', '/jobs', VIDEO_URL)
+    assert status == 202 and job['id']
+    assert 'Access-Control-Allow-Origin' not in headers
+
+
+@pytest.mark.parametrize('body', [{'url': 5}, {'url': None}, {'url': ["x"]}, ["not", "an", "object"], {}])
+def test_malformed_json_is_a_bad_request(server, body):
+    status, _, payload = request(server, 'POST', '/jobs', json.dumps(body), {'Content-Type': 'application/json'})
+    assert status == 400 and 'error' in payload
+
+
+def test_waiting_for_a_failed_job_returns_a_final_status(server):
+    status, _, job = request(server, 'POST', '/jobs?wait=1', FAILING_URL)
+    assert status == 502
+    assert job['status'] == 'failed'
+
+
+def test_unknown_jobs_are_not_found(server):
+    status, _, payload = request(server, 'GET', '/jobs/no-such-job')
+    assert status == 404 and payload['error'] == 'unknown job'
+
+
+def test_waiting_for_a_pruned_job_is_not_found(server, monkeypatch):
+    # Later submissions pushed the job out of the table while it was waited for
+    monkeypatch.setattr(server.notes, 'wait', lambda job_id, timeout: None)
+    status, _, payload = request(server, 'POST', '/jobs?wait=1', VIDEO_URL)
+    assert status == 404 and payload['error'] == 'unknown job' and payload['id']
+
+
+def test_finished_jobs_are_pruned(server, monkeypatch):
+    monkeypatch.setattr(server.notes, 'MAX_FINISHED_JOBS', 0)
+    first = server.notes.submit(VIDEO_URL)
+    assert server.notes.wait(first['id'], 5)['status'] == 'done'
+
+    second = server.notes.submit(FAILING_URL)
+    assert second['status'] == 'queued'
+    assert server.notes.describe(first['id']) is None
+    assert server.notes.wait(first['id'], 5) is None
+    assert server.notes.wait(second['id'], 5)['status'] == 'failed'
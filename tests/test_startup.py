@@ -0,0 +1,45 @@
+import json
+import os
+import subprocess
+import sys
+import textwrap
+
+import youtube_notes_fixed as notes
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# The no-network path: import, parse arguments, cache hit, render, append
+BUDGET_SECONDS = 0.1
+
+SCRIPT = textwrap.dedent("""
+    import json, sys, time
+    start = time.perf_counter()
+    import youtube_notes_fixed
+    youtube_notes_fixed.main(['https://youtu.be/qWm8yJ_mDAs', '--offline', '--output', 'notes.md'])
+    elapsed = time.perf_counter() - start
+    print(json.dumps({'elapsed': elapsed, 'yt_dlp': 'yt_dlp' in sys.modules}))
+""")
+
+
+def test_offline_cache_hit_stays_within_the_startup_budget(tmp_path):
+    with notes.MetadataCache(str(tmp_path / notes.CACHE_FILE)) as cache:
+        cache.put("qWm8yJ_mDAs", notes.VideoRecord(video_id="qWm8yJ_mDAs", title="10 Pro Tips for AI Coding",
+                                                   channel_name="Volo Builds", views=9157))
+    # An importable yt_dlp, to show that it is not imported rather than missing
+    fake = tmp_path / "fake" / "yt_dlp"
+    fake.mkdir(parents=True)
+    (fake / "__init__.py").write_text("import time\ntime.sleep(1)\n")
+
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([REPO, str(tmp_path / "fake")]))
+    # Measure normal runs, which load the module from its cached bytecode
+    env.pop('PYTHONDONTWRITEBYTECODE', None)
+    timings = []
+    for _ in range(3):
+        output = subprocess.run([sys.executable, "-c", SCRIPT], cwd=tmp_path, env=env, capture_output=True,
+                                text=True, check=True).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        assert not result['yt_dlp']
+        timings.append(result['elapsed'])
+
+    assert "# [10 Pro Tips for AI Coding]" in (tmp_path / "notes.md").read_text()
+    # The best of a few runs (the first may compile the module), so a busy machine does not fail the test
+    assert min(timings) < BUDGET_SECONDS, timings
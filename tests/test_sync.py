@@ -0,0 +1,110 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import youtube_notes_fixed as notes
+
+CHANNEL = "https://www.youtube.com/@chan/videos"
+# Newest first, as the Videos tab lists them
+UPLOADS = [{'id': f"vid{i:07d}A", 'upload_date': f"2025010{9 - i}"} for i in range(6)]
+
+
+def url_of(entry):
+    return f"https://www.youtube.com/watch?v={entry['id']}"
+
+
+@pytest.fixture
+def state(tmp_path, monkeypatch):
+    monkeypatch.setattr(notes, 'iter_collection_entries', lambda url: iter(UPLOADS))
+    with notes.ChannelSyncState(str(tmp_path / "sync.sqlite")) as state:
+        state.follow(CHANNEL)
+        yield state
+
+
+def processor(failing=(), seen=None, kind=notes.TRANSIENT):
+    def process(urls):
+        if seen is not None:
+            seen.append(urls)
+        results = [(url, url not in failing, "", 0.0) for url in urls]
+        return results, {url: kind for url in urls if url in failing}
+    return process
+
+
+def test_first_sync_marks_the_upload_below_the_initial_window(state):
+    seen = []
+    notes.sync_channel(CHANNEL, state, processor(seen=seen), initial=3)
+
+    assert seen == [[url_of(UPLOADS[2]), url_of(UPLOADS[1]), url_of(UPLOADS[0])]]
+    assert state.get_mark(CHANNEL)[0] == UPLOADS[0]['id']
+
+
+def test_failed_initial_upload_is_retried_on_the_next_sync(state):
+    notes.sync_channel(CHANNEL, state, processor(failing={url_of(UPLOADS[2])}), initial=3)
+    assert state.get_mark(CHANNEL)[0] == UPLOADS[3]['id']
+
+    seen = []
+    notes.sync_channel(CHANNEL, state, processor(seen=seen), initial=3)
+    assert seen[0][0] == url_of(UPLOADS[2])
+    assert state.get_mark(CHANNEL)[0] == UPLOADS[0]['id']
+
+
+def test_permanently_failing_upload_does_not_pin_the_mark(state):
+    notes.sync_channel(CHANNEL, state, processor(), initial=0)
+    state.set_mark(CHANNEL, UPLOADS[4]['id'], UPLOADS[4]['upload_date'])
+
+    # UPLOADS[3] is private: the mark moves past it to the newest upload
+    private = url_of(UPLOADS[3])
+    notes.sync_channel(CHANNEL, state, processor(failing={private}, kind=notes.PERMANENT), initial=0)
+    assert state.get_mark(CHANNEL)[0] == UPLOADS[0]['id']
+
+    seen = []
+    notes.sync_channel(CHANNEL, state, processor(seen=seen), initial=0)
+    assert seen == []
+
+
+def test_transiently_failing_upload_stops_the_mark(state):
+    notes.sync_channel(CHANNEL, state, processor(), initial=0)
+    state.set_mark(CHANNEL, UPLOADS[4]['id'], UPLOADS[4]['upload_date'])
+
+    flaky = url_of(UPLOADS[2])
+    for kind in (notes.TRANSIENT, notes.THROTTLED):
+        notes.sync_channel(CHANNEL, state, processor(failing={flaky}, kind=kind), initial=0)
+        assert state.get_mark(CHANNEL)[0] == UPLOADS[3]['id']
+
+
+def test_process_batch_reports_why_fetches_failed(tmp_path):
+    def fetch(url):
+        notes.note_failure(notes.PERMANENT if url.endswith("A") else notes.TRANSIENT)
+        return None
+
+    failures = {}
+    urls = ["https://www.youtube.com/watch?v=aaaaaaaaaaA", "https://www.youtube.com/watch?v=bbbbbbbbbbE"]
+    results = notes.process_batch(urls, fetch, workers=2, filename=str(tmp_path / "notes.md"), failures=failures)
+
+    assert [success for _, success, _, _ in results] == [False, False]
+    assert failures == {urls[0]: notes.PERMANENT, urls[1]: notes.TRANSIENT}
+
+
+def test_first_sync_without_initial_uploads_only_starts_following(state):
+    seen = []
+    notes.sync_channel(CHANNEL, state, processor(seen=seen), initial=0)
+
+    assert seen == []
+    assert state.get_mark(CHANNEL)[0] == UPLOADS[0]['id']
+
+
+def test_process_batch_reuses_a_given_executor(tmp_path):
+    threads = set()
+
+    def fetch(url):
+        threads.add(threading.current_thread().name)
+        return None
+
+    with ThreadPoolExecutor(max_workers=2, thread_name_prefix='sync') as executor:
+        for _ in range(3):
+            notes.process_batch(["https://www.youtube.com/watch?v=aaaaaaaaaaA"] * 4, fetch, workers=2,
+                                filename=str(tmp_path / "notes.md"), executor=executor)
+        # Still usable after the batches
+        assert executor.submit(lambda: 1).result() == 1
+    assert len(threads) <= 2
@@ -0,0 +1,81 @@
+import pytest
+
+import youtube_notes_fixed as notes
+
+
+@pytest.mark.parametrize('url, expected', [
+    ("https://www.youtube.com/@veritasium", "https://www.youtube.com/@veritasium/videos"),
+    ("youtube.com/@veritasium/shorts", "https://www.youtube.com/@veritasium/shorts"),
+    ("https://m.youtube.com/playlist?list=PL123", "https://www.youtube.com/playlist?list=PL123"),
+    ("https://music.youtube.com/channel/UCabc", "https://www.youtube.com/channel/UCabc/videos"),
+    ("https://WWW.YouTube.com:443/c/name", "https://www.youtube.com/c/name/videos"),
+    ("@veritasium", "https://www.youtube.com/@veritasium/videos"),
+])
+def test_collection_url_expands_youtube_hosts(url, expected):
+    assert notes.collection_url(url) == expected
+
+
+@pytest.mark.parametrize('url', [
+    "https://notyoutube.com/@veritasium",
+    "https://www.notyoutube.com/playlist?list=PL123",
+    "https://youtube.com.evil.example/@veritasium",
+    "https://evil.example/?youtube.com",
+    "https://www.youtube.com/watch?v=qWm8yJ_mDAs",
+])
+def test_collection_url_rejects_other_hosts(url):
+    assert notes.collection_url(url) is None
+
+
+@pytest.mark.parametrize('url', [
+    "qWm8yJ_mDAs",
+    "https://www.youtube.com/watch?v=qWm8yJ_mDAs",
+    "https://www.youtube.com/watch?feature=share&v=qWm8yJ_mDAs&t=42s#comments",
+    "http://youtube.com/watch/?v=qWm8yJ_mDAs",
+    "www.youtube.com/watch?v=qWm8yJ_mDAs",
+    "https://m.youtube.com/watch?v=qWm8yJ_mDAs",
+    "https://music.youtube.com/watch?v=qWm8yJ_mDAs&list=RDAMVM",
+    "https://www.youtube.com:443/watch?v=qWm8yJ_mDAs",
+    "HTTPS://WWW.YOUTUBE.COM/watch?v=qWm8yJ_mDAs",
+    "https://youtu.be/qWm8yJ_mDAs?si=tracking",
+    "youtu.be/qWm8yJ_mDAs",
+    "https://youtu.be:443/qWm8yJ_mDAs",
+    "https://www.youtube.com/shorts/qWm8yJ_mDAs",
+    "https://www.youtube.com/embed/qWm8yJ_mDAs?start=10",
+    "https://www.youtube-nocookie.com/embed/qWm8yJ_mDAs",
+    "https://www.youtube.com/live/qWm8yJ_mDAs",
+    "  https://youtu.be/qWm8yJ_mDAs  ",
+])
+def test_parse_video_id_accepts_every_video_url_form(url):
+    assert notes.parse_video_id(url) == "qWm8yJ_mDAs"
+
+
+@pytest.mark.parametrize('url', [
+    "https://notyoutube.com/watch?v=qWm8yJ_mDAs",
+    "https://youtube.com.evil.example/watch?v=qWm8yJ_mDAs",
+    "https://evil.example/youtube.com/watch?v=qWm8yJ_mDAs",
+    "https://notyoutu.be/qWm8yJ_mDAs",
+    "https://www.youtube.com:abc/watch?v=qWm8yJ_mDAs",
+    "ftp://www.youtube.com/watch?v=qWm8yJ_mDAs",
+    "https://www.youtube.com/watch?v=tooshort",
+    "https://www.youtube.com/@veritasium",
+    "https://www.youtube.com/playlist?list=PL123",
+    "not a url",
+])
+def test_parse_video_id_rejects_other_urls(url):
+    assert notes.parse_video_id(url) is None
+
+
+def test_normalize_urls_canonicalizes_dedupes_and_rejects():
+    urls = [
+        "https://youtu.be/qWm8yJ_mDAs",
+        "https://www.youtube.com:443/watch?v=qWm8yJ_mDAs&t=1",
+        "https://www.youtube.com/shorts/aaaaaaaaaaA",
+        "https://notyoutube.com/watch?v=bbbbbbbbbbA",
+        "https://www.youtube.com/@veritasium",
+        "youtube.com/@veritasium/videos",
+    ]
+    assert list(notes.normalize_urls(urls)) == [
+        "https://www.youtube.com/watch?v=qWm8yJ_mDAs",
+        "https://www.youtube.com/watch?v=aaaaaaaaaaA",
+        "https://www.youtube.com/@veritasium/videos",
+    ]
@@ -8,263 +8,3910 @@ import os
 import re
 import sys
 import json
+import random
+import time
+import shutil
+import hashlib
+import tempfile
+import contextlib
 import datetime
+import dataclasses
+import threading
 import traceback
+import queue
+import sqlite3
 import logging
-import subprocess
-from urllib.parse import urlparse, parse_qs
-
-# Set up logging to file
-logging.basicConfig(
-    filename='youtube_notes.log',
-    level=logging.DEBUG,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    filemode='w'  # Overwrite log file each time
-)
+import argparse
+import functools
+import importlib.util
+from collections import OrderedDict, deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from urllib.parse import urlparse, urlsplit, parse_qs, urlencode
+
+def setup_logging():
+    """Log to youtube_notes.log and the console
 
-# Log both to file and console
-console = logging.StreamHandler()
-console.setLevel(logging.INFO)
-logging.getLogger('').addHandler(console)
+    Called by main() rather than at import time, so importing this module
+    (as youtube_notes.py does) leaves the caller's logging alone.
+    """
+    logging.basicConfig(
+        filename='youtube_notes.log',
+        level=logging.DEBUG,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        filemode='w'  # Overwrite log file each time
+    )
+    
+    # Log both to file and console
+    console = logging.StreamHandler()
+    console.setLevel(logging.INFO)
+    logging.getLogger('').addHandler(console)
 
 def log_exception(e):
     """Log exception with traceback to file"""
     logging.error(f"Exception: {str(e)}")
     logging.error(traceback.format_exc())
 
-def ensure_dependencies():
-    """Ensure all required dependencies are installed"""
+# Packages needed to fetch video information: (module name, pip package)
+DEPENDENCIES = (
+    ('yt_dlp', 'yt-dlp'),
+)
+
+def check_dependencies():
+    """Check that all required dependencies are installed
+
+    Only probes with importlib.util.find_spec, so nothing is imported or
+    installed here; the heavy modules are imported when first used.
+    """
+    missing = [package for module, package in DEPENDENCIES if importlib.util.find_spec(module) is None]
+    if missing:
+        logging.error(f"Missing dependencies: {', '.join(missing)}. "
+                      f"Install them with: python {os.path.basename(sys.argv[0])} install")
+        return False
+    return True
+
+def install_dependencies():
+    """Install the required dependencies with pip (the install command)"""
+    import subprocess
+    
+    packages = [package for _, package in DEPENDENCIES]
     try:
-        logging.info("Checking for required dependencies")
-        try:
-            import yt_dlp
-            logging.info("yt-dlp already installed")
-        except ImportError:
-            logging.info("Installing yt-dlp")
-            subprocess.check_call([sys.executable, "-m", "pip", "install", "yt-dlp"])
-            logging.info("Successfully installed yt-dlp")
-            import yt_dlp
-        
+        logging.info(f"Installing {', '.join(packages)}")
+        subprocess.check_call([sys.executable, "-m", "pip", "install", *packages])
+        logging.info(f"Successfully installed {', '.join(packages)}")
         return True
     except Exception as e:
         logging.error(f"Failed to install dependencies: {e}")
         log_exception(e)
         return False
 
+_dependencies_lock = threading.Lock()
+_dependencies_ready = None
+
+def require_dependencies():
+    """Run check_dependencies once per process, the first time yt-dlp is needed"""
+    global _dependencies_ready
+    with _dependencies_lock:
+        if _dependencies_ready is None:
+            _dependencies_ready = check_dependencies()
+        return _dependencies_ready
+
+# Video IDs are 11 URL-safe base64 characters encoding 64 bits, so the
+# last character only carries 4 bits and comes from a 16-letter alphabet
+VIDEO_ID_RE = re.compile(r'^[A-Za-z0-9_-]{10}[AEIMQUYcgkosw048]$')
+
+# Hosts of YouTube's pages, matched exactly (ports aside) so that
+# look-alike domains such as notyoutube.com are never taken for YouTube
+YOUTUBE_HOSTS = frozenset({'youtube.com', 'www.youtube.com', 'm.youtube.com', 'music.youtube.com'})
+EMBED_HOSTS = YOUTUBE_HOSTS | {'youtube-nocookie.com', 'www.youtube-nocookie.com'}
+SHORT_LINK_HOSTS = frozenset({'youtu.be', 'www.youtu.be'})
+
+# Every URL form that names a single video: youtu.be links, watch pages
+# and the embed, v, e, shorts and live paths. Timestamps, playlists and
+# tracking parameters are ignored.
+VIDEO_PATH_RE = re.compile(r'^/(?:embed|v|e|shorts|live)/([\w-]+)', re.IGNORECASE)
+SHORT_LINK_PATH_RE = re.compile(r'^/([\w-]+)')
+WATCH_V_RE = re.compile(r'(?:^|&)v=([\w-]+)')
+
+def split_url(url):
+    """urlsplit an http(s) URL, which may leave out its scheme; None for anything else"""
+    try:
+        parts = urlsplit(url if '://' in url else f"https://{url}")
+        parts.port  # raises ValueError for a malformed port
+    except ValueError:
+        return None
+    return parts if parts.scheme.lower() in ('http', 'https') else None
+
+def parse_video_id(url):
+    """Return the video ID of a YouTube video URL (or a bare ID), or None
+
+    Purely local: the ID is only checked for the right format, not looked up.
+    """
+    url = url.strip()
+    if VIDEO_ID_RE.match(url):
+        return url
+    parts = split_url(url)
+    if parts is None:
+        return None
+    
+    match = None
+    if parts.hostname in SHORT_LINK_HOSTS:
+        match = SHORT_LINK_PATH_RE.match(parts.path)
+    elif parts.hostname in EMBED_HOSTS:
+        if parts.path.lower() in ('/watch', '/watch/'):
+            match = WATCH_V_RE.search(parts.query)
+        else:
+            match = VIDEO_PATH_RE.match(parts.path)
+    if match and VIDEO_ID_RE.match(match.group(1)):
+        return match.group(1)
+    return None
+
 def extract_video_id(url):
     """Extract the video ID from a YouTube URL"""
-    logging.info(f"Extracting video ID from URL: {url}")
-    # Handle different URL formats
-    if 'youtu.be' in url:
-        video_id = url.split('/')[-1].split('?')[0]
-        logging.info(f"Extracted video ID (youtu.be format): {video_id}")
+    video_id = parse_video_id(url)
+    if video_id:
+        logging.info(f"Extracted video ID {video_id} from URL: {url}")
         return video_id
     
-    parsed_url = urlparse(url)
-    if 'youtube.com' in parsed_url.netloc:
-        if '/watch' in parsed_url.path:
-            video_id = parse_qs(parsed_url.query)['v'][0]
-            logging.info(f"Extracted video ID (youtube.com/watch format): {video_id}")
-            return video_id
-        elif '/embed/' in parsed_url.path:
-            video_id = parsed_url.path.split('/')[-1]
-            logging.info(f"Extracted video ID (youtube.com/embed format): {video_id}")
-            return video_id
-        elif '/v/' in parsed_url.path:
-            video_id = parsed_url.path.split('/')[-1]
-            logging.info(f"Extracted video ID (youtube.com/v format): {video_id}")
-            return video_id
-    
-    # If no video ID found, return the original URL (might be just the ID)
+    # If no video ID found, return the original URL
     logging.warning(f"Could not extract video ID, using URL as is: {url}")
     return url
 
-def get_video_info(url):
-    """Get information about a YouTube video using yt-dlp"""
+# Channel paths: /@handle, /channel/UC..., /c/name and /user/name, with an optional tab
+CHANNEL_PATH_RE = re.compile(r'^/(@[\w.-]+|channel/UC[\w-]+|c/[^/]+|user/[^/]+)(?:/(\w+))?$')
+
+def collection_url(url):
+    """Return the URL to expand if url is a playlist or channel, otherwise None
+
+    Channel URLs without a tab are pointed at their Videos tab, so only
+    regular uploads are listed.
+    """
+    if url.startswith('@'):
+        url = f"https://www.youtube.com/{url}"
+    parsed = split_url(url)
+    if parsed is None or parsed.hostname not in YOUTUBE_HOSTS:
+        return None
+    
+    path = parsed.path.rstrip('/')
+    if path == '/playlist' and 'list' in parse_qs(parsed.query):
+        return f"https://www.youtube.com/playlist?list={parse_qs(parsed.query)['list'][0]}"
+    
+    match = CHANNEL_PATH_RE.match(path)
+    if match:
+        return f"https://www.youtube.com/{match.group(1)}/{match.group(2) or 'videos'}"
+    return None
+
+# Flat, lazy extraction: list the entries of a playlist or channel page by
+# page without resolving any of the videos
+FLAT_YDL_OPTS = {
+    'quiet': True,
+    'no_warnings': True,
+    'skip_download': True,
+    'ignoreerrors': True,
+    'extract_flat': 'in_playlist',
+    'lazy_playlist': True,
+}
+
+def iter_collection_entries(url):
+    """Yield the flat entries of a playlist or channel as yt-dlp pages through it
+
+    Each entry is a small dict with at least 'id' and usually 'title'.
+    Nothing is fetched until the generator is consumed, and only as many
+    pages as are consumed are downloaded.
+    """
+    import yt_dlp
+    
+    logging.info(f"Expanding {url}")
+    count = 0
+    with yt_dlp.YoutubeDL(FLAT_YDL_OPTS) as ydl:
+        result = ydl.extract_info(url, download=False, process=False)
+        if not result:
+            logging.error(f"yt-dlp couldn't list the videos of {url}")
+            return
+        try:
+            for entry in result.get('entries') or ():
+                if not entry or not entry.get('id') or entry.get('ie_key', 'Youtube') != 'Youtube':
+                    continue
+                count += 1
+                yield entry
+        except Exception as e:
+            logging.error(f"Error while listing the videos of {url}: {e}")
+            log_exception(e)
+    logging.info(f"Listed {count} videos from {url}")
+
+def normalize_urls(urls):
+    """Canonicalize and dedupe a batch of URLs in one pass, before any network I/O
+
+    Video URLs in any form become https://www.youtube.com/watch?v=ID and
+    playlist and channel URLs become their collection_url, so the same
+    video or channel given twice in different forms is only kept once.
+    Anything else is rejected with a warning.
+    """
+    seen = set()
+    rejected = duplicates = 0
+    for url in urls:
+        video_id = parse_video_id(url)
+        canonical = f"https://www.youtube.com/watch?v={video_id}" if video_id else collection_url(url)
+        if canonical is None:
+            logging.warning(f"Skipping, not a YouTube video, playlist or channel URL: {url}")
+            rejected += 1
+            continue
+        if canonical in seen:
+            logging.info(f"Skipping duplicate of {canonical}: {url}")
+            duplicates += 1
+            continue
+        seen.add(canonical)
+        yield canonical
+    if rejected or duplicates:
+        logging.info(f"Input normalized: {duplicates} duplicates and {rejected} invalid URLs skipped")
+
+def expand_urls(urls):
+    """Yield video URLs, lazily expanding any playlist or channel URLs among them"""
+    for url in urls:
+        collection = collection_url(url)
+        if collection is None:
+            yield url
+            continue
+        if not require_dependencies():
+            continue
+        for entry in iter_collection_entries(collection):
+            yield f"https://www.youtube.com/watch?v={entry['id']}"
+
+# Configure yt-dlp (full extraction, including format selection)
+YDL_OPTS = {
+    'format': 'best',
+    'quiet': True,
+    'no_warnings': True,
+    'skip_download': True,  # We don't want to download the video, just get info
+    # Errors must reach the retry layer: with ignoreerrors a 429 or a timeout
+    # would look exactly like a deleted video
+    'ignoreerrors': False,
+}
+
+# Metadata-only options: format_for_markdown never looks at streams, so skip
+# the player JS download, signature handling and DASH/HLS manifests
+NOTES_YDL_OPTS = {
+    'quiet': True,
+    'no_warnings': True,
+    'skip_download': True,
+    'ignoreerrors': False,
+    'check_formats': False,
+    'getcomments': False,
+    'writesubtitles': False,
+    'writeautomaticsub': False,
+    'extractor_args': {
+        'youtube': {
+            'skip': ['dash', 'hls', 'translated_subs'],
+            'player_skip': ['js', 'configs'],
+        },
+    },
+}
+
+# Extraction profiles: yt-dlp options plus whether yt-dlp should post-process
+# the result (format sorting/selection). The notes profile returns the raw
+# extractor result, which already holds every field the template uses.
+EXTRACTION_PROFILES = {
+    'full': {'ydl_opts': YDL_OPTS, 'process': True},
+    'notes': {'ydl_opts': NOTES_YDL_OPTS, 'process': False},
+}
+DEFAULT_PROFILE = 'notes'
+
+class ExtractorSession:
+    """Long-lived yt-dlp extractor shared by all videos in a run
+
+    Keeps configured YoutubeDL instances alive so the extractor registry,
+    HTTP opener, cookie jar and cached player data are reused between videos.
+    YoutubeDL is not thread-safe, so every worker thread gets its own
+    instance, created on first use and closed by close().
+
+    With count_bytes the session also totals the response bytes read by the
+    extractors in bytes_received, which the profile benchmark reports.
+    """
+    
+    def __init__(self, profile=DEFAULT_PROFILE, count_bytes=False):
+        self.profile = profile
+        self.ydl_opts = dict(EXTRACTION_PROFILES[profile]['ydl_opts'])
+        self.process = EXTRACTION_PROFILES[profile]['process']
+        self.count_bytes = count_bytes
+        self.bytes_received = 0
+        self._local = threading.local()
+        self._instances = []
+        self._lock = threading.Lock()
+    
+    def get_ydl(self):
+        """Return the YoutubeDL instance for the calling thread"""
+        ydl = getattr(self._local, 'ydl', None)
+        if ydl is None:
+            import yt_dlp
+            logging.info(f"Creating yt-dlp instance for thread {threading.current_thread().name}")
+            ydl = yt_dlp.YoutubeDL(self.ydl_opts)
+            if self.count_bytes:
+                self._wrap_urlopen(ydl)
+            self._local.ydl = ydl
+            with self._lock:
+                self._instances.append(ydl)
+        return ydl
+    
+    def _wrap_urlopen(self, ydl):
+        """Count the bytes of every response body read through this instance"""
+        urlopen = ydl.urlopen
+        
+        def counting_urlopen(req):
+            response = urlopen(req)
+            read = response.read
+            
+            def counting_read(*args, **kwargs):
+                data = read(*args, **kwargs)
+                with self._lock:
+                    self.bytes_received += len(data)
+                return data
+            
+            response.read = counting_read
+            return response
+        
+        ydl.urlopen = counting_urlopen
+    
+    def extract_info(self, url):
+        return self.get_ydl().extract_info(url, download=False, process=self.process)
+    
+    def close(self):
+        with self._lock:
+            instances, self._instances = self._instances, []
+        for ydl in instances:
+            try:
+                ydl.close()
+            except Exception as e:
+                logging.warning(f"Error closing yt-dlp instance: {e}")
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
+
+# Failure classes for extraction errors: transient failures (timeouts,
+# dropped connections, 5xx) and throttling are retried with backoff,
+# permanent ones (unavailable, private or removed videos...) are not
+TRANSIENT, THROTTLED, PERMANENT = 'transient', 'throttled', 'permanent'
+
+THROTTLE_MARKERS = (
+    'http error 429', 'too many requests', "confirm you're not a bot",
+    'confirm you are not a bot', 'rate-limit', 'rate limit',
+)
+TRANSIENT_MARKERS = (
+    'timed out', 'timeout', 'connection reset', 'connection refused', 'connection aborted',
+    'remote end closed', 'temporary failure', 'name resolution', 'network is unreachable',
+    'incompleteread', 'http error 500', 'http error 502', 'http error 503', 'http error 504',
+)
+
+def classify_error(e):
+    """Return TRANSIENT, THROTTLED or PERMANENT for an extraction exception
+
+    yt-dlp wraps network errors in DownloadError/ExtractorError, so the
+    message text is what tells a 429 apart from a deleted video.
+    """
+    # YouTube's bot check spells "you're" with a curly apostrophe (U+2019)
+    message = str(e).lower().replace('\u2019', "'")
+    if getattr(e, 'code', None) == 429 or any(marker in message for marker in THROTTLE_MARKERS):
+        return THROTTLED
+    if isinstance(e, (TimeoutError, ConnectionError)) or any(marker in message for marker in TRANSIENT_MARKERS):
+        return TRANSIENT
+    return PERMANENT
+
+# Fetch functions return None on failure; they note why here, per thread,
+# so that a batch can tell videos that will never load from bad luck
+_fetch_failure = threading.local()
+
+def note_failure(kind):
+    """Record the failure class of the current thread's failing fetch"""
+    _fetch_failure.kind = kind
+
+def take_failure():
+    """Return and forget the failure class noted by this thread, or None"""
+    kind = getattr(_fetch_failure, 'kind', None)
+    _fetch_failure.kind = None
+    return kind
+
+class CircuitBreaker:
+    """Pause all workers while YouTube is throttling us
+
+    After threshold throttled failures in a row the breaker opens and every
+    caller of wait() blocks for the cooldown. Then a single probe request
+    is let through: if it succeeds the breaker closes, if it is throttled
+    again the breaker reopens with twice the cooldown (up to max_cooldown).
+    """
+    
+    def __init__(self, threshold=3, cooldown=30.0, max_cooldown=600.0):
+        self.threshold = threshold
+        self.base_cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.cooldown = cooldown
+        self.failures = 0
+        self.trips = 0
+        self.open_until = 0.0
+        self.probing = False
+        self._cond = threading.Condition()
+    
+    def wait(self):
+        """Block until a request may be made"""
+        with self._cond:
+            while True:
+                remaining = self.open_until - time.monotonic()
+                if remaining > 0:
+                    self._cond.wait(remaining)
+                elif self.probing:
+                    self._cond.wait()
+                else:
+                    if self.open_until:
+                        # Cooldown is over, this caller is the probe
+                        self.probing = True
+                    return
+    
+    def record_success(self):
+        with self._cond:
+            if self.open_until:
+                logging.info("Throttling is over, resuming all workers")
+            self.failures = 0
+            self.open_until = 0.0
+            self.cooldown = self.base_cooldown
+            self.probing = False
+            self._cond.notify_all()
+    
+    def record_failure(self, kind):
+        with self._cond:
+            if kind == THROTTLED:
+                self.failures += 1
+                if self.probing or self.failures >= self.threshold:
+                    if self.probing:
+                        self.cooldown = min(self.cooldown * 2, self.max_cooldown)
+                    self.trips += 1
+                    self.open_until = time.monotonic() + self.cooldown
+                    logging.warning(f"YouTube is throttling requests, pausing all workers for {self.cooldown:.0f}s")
+            elif self.probing:
+                # The probe failed for another reason, let the next one try
+                self.failures = 0
+                self.open_until = 0.0
+            self.probing = False
+            self._cond.notify_all()
+
+DEFAULT_MAX_WORKERS = 32
+
+class AdaptiveConcurrency:
+    """AIMD limit on the number of extractions in flight
+
+    Completed extractions are looked at in windows of one per allowed slot
+    (at least four). Throttling halves the limit, and so does a transient
+    failure rate above max_error_rate over the last error_window
+    extractions, once at least min_error_samples of them and min_errors
+    failures are in; a single unlucky failure never does. A p95 latency above latency_tolerance times
+    the best median seen so far (the uncongested baseline) cuts it by a
+    quarter; otherwise it grows by one. Requests started before a decrease
+    are not counted again, so one burst of 429s only halves the limit once.
+    Every change is kept in history as (seconds since start, limit, reason).
+    """
+    
+    def __init__(self, initial=4, minimum=1, maximum=DEFAULT_MAX_WORKERS, max_error_rate=0.1,
+                 latency_tolerance=2.0, error_window=100, min_error_samples=20, min_errors=2):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.max_error_rate = max_error_rate
+        self.min_error_samples = min_error_samples
+        self.min_errors = min_errors
+        # Rolling outcomes (True for a transient failure) for the error rate
+        self.outcomes = deque(maxlen=error_window)
+        self.latency_tolerance = latency_tolerance
+        self.limit = max(minimum, min(initial, maximum))
+        self.in_flight = 0
+        self.baseline = None
+        self.started = time.monotonic()
+        self.last_decrease = self.started
+        self.history = [(0.0, self.limit, 'initial')]
+        self._reset_window()
+        self._cond = threading.Condition()
+    
+    def _reset_window(self):
+        self.latencies = []
+        self.errors = 0
+        self.throttled = 0
+    
+    def acquire(self):
+        """Wait for a free slot; returns the start time to pass to release()"""
+        with self._cond:
+            while self.in_flight >= self.limit:
+                self._cond.wait()
+            self.in_flight += 1
+            return time.monotonic()
+    
+    def release(self, started, kind=None):
+        """Free a slot, reporting how the extraction went (a failure class or None)"""
+        now = time.monotonic()
+        with self._cond:
+            self.in_flight -= 1
+            if started >= self.last_decrease:
+                if kind == THROTTLED:
+                    self.throttled += 1
+                elif kind == TRANSIENT:
+                    self.errors += 1
+                    self.outcomes.append(True)
+                elif kind is None:
+                    self.latencies.append(now - started)
+                    self.outcomes.append(False)
+                samples = len(self.latencies) + self.errors + self.throttled
+                if self.throttled or samples >= max(4, self.limit):
+                    self._adjust(samples)
+            self._cond.notify_all()
+    
+    def _adjust(self, samples):
+        errors = sum(self.outcomes)
+        if self.throttled:
+            self._set_limit(self.limit / 2, "throttled")
+        elif (len(self.outcomes) >= self.min_error_samples and errors >= self.min_errors
+              and errors > len(self.outcomes) * self.max_error_rate):
+            self._set_limit(self.limit / 2, f"{errors}/{len(self.outcomes)} failed")
+        elif self.latencies:
+            latencies = sorted(self.latencies)
+            median = latencies[len(latencies) // 2]
+            p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+            self.baseline = median if self.baseline is None else min(self.baseline, median)
+            if p95 > self.baseline * self.latency_tolerance:
+                self._set_limit(self.limit * 0.75, f"p95 {p95:.2f}s")
+            elif errors <= len(self.outcomes) * self.max_error_rate:
+                self._set_limit(self.limit + 1, f"p95 {p95:.2f}s")
+        self._reset_window()
+    
+    def _set_limit(self, limit, reason):
+        limit = max(self.minimum, min(self.maximum, int(limit)))
+        if limit == self.limit:
+            return
+        now = time.monotonic()
+        if limit < self.limit:
+            self.last_decrease = now
+            self.outcomes.clear()
+        logging.info(f"Concurrency limit {self.limit} -> {limit} ({reason})")
+        self.limit = limit
+        self.history.append((now - self.started, limit, reason))
+
+DEFAULT_RETRIES = 3
+DEFAULT_BACKOFF = 1.0
+MAX_BACKOFF = 60.0
+
+class RetryPolicy:
+    """Retry transient and throttled extraction failures with backoff
+
+    Delays grow exponentially from base_delay (throttled failures start four
+    times higher) and are drawn uniformly from [0, delay] ("full jitter") so
+    workers that failed together do not retry together. Every attempt first
+    waits on the shared CircuitBreaker, if any, and then takes a slot from
+    the AdaptiveConcurrency limiter, if any, for as long as it runs.
+    """
+    
+    def __init__(self, retries=DEFAULT_RETRIES, base_delay=DEFAULT_BACKOFF, max_delay=MAX_BACKOFF, breaker=None,
+                 limiter=None):
+        self.retries = retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.breaker = breaker
+        self.limiter = limiter
+    
+    def delay(self, attempt, kind):
+        base = self.base_delay * (4 if kind == THROTTLED else 1)
+        return random.uniform(0, min(self.max_delay, base * 2 ** attempt))
+    
+    def call(self, func, *args, **kwargs):
+        """Call func, retrying it; the last exception is re-raised"""
+        attempt = 0
+        while True:
+            if self.breaker is not None:
+                self.breaker.wait()
+            started = self.limiter.acquire() if self.limiter is not None else None
+            try:
+                result = func(*args, **kwargs)
+            except Exception as e:
+                kind = classify_error(e)
+                if self.limiter is not None:
+                    self.limiter.release(started, kind)
+                if self.breaker is not None:
+                    self.breaker.record_failure(kind)
+                if kind == PERMANENT or attempt >= self.retries:
+                    raise
+                delay = self.delay(attempt, kind)
+                logging.warning(f"{kind.capitalize()} failure ({e}), retrying in {delay:.1f}s")
+                time.sleep(delay)
+                attempt += 1
+                continue
+            if self.limiter is not None:
+                self.limiter.release(started)
+            if self.breaker is not None:
+                self.breaker.record_success()
+            return result
+
+# Fields of a VideoRecord that change all the time. Everything else (title,
+# channel, publish date, duration, thumbnail, description...) is static.
+STATS_FIELDS = ('views', 'likes', 'comments', 'channel_subscribers')
+
+def as_count(value):
+    """Return value as an int count, or None if unknown
+
+    Also reads the pre-formatted strings ('9,157', '26.6K', 'Unknown')
+    older versions stored in the cache.
+    """
+    if value is None or isinstance(value, int):
+        return value
+    try:
+        return parse_count(str(value))
+    except ValueError:
+        return None
+
+def as_date(value):
+    """Return value as a datetime.date, or None if it is not an ISO date"""
+    if value is None or isinstance(value, datetime.date):
+        return value
+    try:
+        return datetime.date.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+
+def as_duration(value):
+    """Return value (seconds, or an 'H:MM:SS' string) as a datetime.timedelta, or None"""
+    if value is None or isinstance(value, datetime.timedelta):
+        return value
+    if isinstance(value, (int, float)):
+        return datetime.timedelta(seconds=int(value))
+    match = re.match(r'^(?:(\d+) days?, )?(\d+):(\d\d):(\d\d)$', str(value))
+    if not match:
+        return None
+    days, hours, minutes, seconds = (int(group or 0) for group in match.groups())
+    return datetime.timedelta(days=days, hours=hours, minutes=minutes, seconds=seconds)
+
+@dataclasses.dataclass(slots=True)
+class VideoRecord:
+    """Information about one video, as native values
+
+    Unknown values are None. Counts are ints, dates datetime.date and the
+    duration a datetime.timedelta; format_for_markdown does all the
+    formatting, so records can be sorted, summed and compared directly.
+    """
+    video_id: str
+    title: str
+    channel_name: str | None = None
+    channel_url: str = ''
+    thumbnail_url: str = ''
+    description: str = ''
+    publish_date: datetime.date | None = None
+    capture_date: datetime.date = dataclasses.field(default_factory=datetime.date.today)
+    duration: datetime.timedelta | None = None
+    category: str | None = None
+    views: int | None = None
+    likes: int | None = None
+    comments: int | None = None
+    channel_subscribers: int | None = None
+    
+    @property
+    def hashtags(self):
+        return re.findall(r'#\w+', self.description)
+    
+    def to_dict(self):
+        """Return a JSON-serialisable dict (dates as ISO strings, the duration in seconds)"""
+        data = {field.name: getattr(self, field.name) for field in dataclasses.fields(self)}
+        for name in ('publish_date', 'capture_date'):
+            if data[name] is not None:
+                data[name] = data[name].isoformat()
+        if self.duration is not None:
+            data['duration'] = int(self.duration.total_seconds())
+        return data
+    
+    @classmethod
+    def from_dict(cls, data):
+        """Build a record from to_dict() output or an info dict cached by an older version"""
+        values = {field.name: data[field.name] for field in dataclasses.fields(cls) if field.name in data}
+        for name in ('channel_name', 'category'):
+            if values.get(name) == 'Unknown':
+                values[name] = None
+        for name in ('publish_date', 'capture_date'):
+            if name in values:
+                values[name] = as_date(values[name])
+        if values.get('capture_date') is None:
+            values.pop('capture_date', None)
+        values['duration'] = as_duration(values.get('duration'))
+        for name in STATS_FIELDS:
+            values[name] = as_count(values.get(name))
+        values['description'] = values.get('description') or ''
+        return cls(**values)
+
+def stats_from_counts(view_count=None, like_count=None, comment_count=None, subscriber_count=None):
+    """Map raw counts onto the STATS_FIELDS of a VideoRecord"""
+    return {
+        'views': view_count,
+        'likes': like_count,
+        'comments': comment_count,
+        'channel_subscribers': subscriber_count,
+    }
+
+# The only fields of yt-dlp's info dict that get_video_info reads. The raw
+# dict also holds every format, caption track and thumbnail plus the
+# heatmap, often several MB per video, so it is projected onto these as
+# soon as extract_info returns and never outlives the extraction call.
+RAW_INFO_FIELDS = (
+    'title', 'uploader', 'uploader_url', 'thumbnail', 'description', 'upload_date', 'timestamp',
+    'duration', 'view_count', 'like_count', 'comment_count', 'channel_follower_count', 'categories',
+)
+
+def project_raw_info(video_info):
+    """Copy the fields get_video_info needs out of a raw yt-dlp info dict"""
+    if not video_info:
+        return None
+    compact = {field: video_info[field] for field in RAW_INFO_FIELDS if field in video_info}
+    # Only the best (last) thumbnail is ever used
+    thumbnails = video_info.get('thumbnails')
+    if thumbnails:
+        compact['thumbnails'] = [{'url': thumbnails[-1].get('url')}]
+    return compact
+
+def get_video_info(url, session=None, profile=DEFAULT_PROFILE, retry=None):
+    """Get information about a YouTube video using yt-dlp
+
+    If an ExtractorSession is given its warm YoutubeDL instance (and its
+    extraction profile) is used, otherwise a fresh one is created for this
+    call with the given profile. With a RetryPolicy, transient and throttled
+    failures are retried before giving up.
+    """
     try:
         import yt_dlp
         
         video_id = extract_video_id(url)
         logging.info(f"Getting information for video ID: {video_id}")
-        
-        # Configure yt-dlp
-        ydl_opts = {
-            'format': 'best',
-            'quiet': True,
-            'no_warnings': True,
-            'skip_download': True,  # We don't want to download the video, just get info
-            'ignoreerrors': True,
-        }
+        watch_url = f"https://www.youtube.com/watch?v={video_id}"
         
         # Extract video information
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            logging.info("Extracting video information with yt-dlp")
-            video_info = ydl.extract_info(f"https://www.youtube.com/watch?v={video_id}", download=False)
-            
-            if not video_info:
-                logging.error("yt-dlp couldn't extract video information")
-                return None
-            
-            logging.info(f"Successfully extracted video information: {video_info.get('title')}")
-            
-            # Format duration
-            duration_seconds = video_info.get('duration')
-            if duration_seconds:
-                duration = str(datetime.timedelta(seconds=duration_seconds))
-            else:
-                duration = "Unknown"
-                
-            # Extract hashtags
-            description = video_info.get('description', '')
-            hashtags = re.findall(r'#\w+', description)
-            hashtags_str = ' '.join(hashtags) if hashtags else 'None'
-            
-            # Create info dictionary
-            info = {
-                'title': video_info.get('title', f"YouTube Video {video_id}"),
-                'channel_name': video_info.get('uploader', 'Unknown'),
-                'channel_url': video_info.get('uploader_url', ''),
-                'thumbnail_url': video_info.get('thumbnail', f"https://img.youtube.com/vi/{video_id}/maxresdefault.jpg"),
-                'description': description,
-                'publish_date': video_info.get('upload_date', 'Unknown'),
-                'views': f"{video_info.get('view_count', 0):,}",
-                'video_id': video_id,
-                'duration': duration,
-                'capture_date': datetime.datetime.now().strftime('%Y-%m-%d'),
-                'hashtags': hashtags_str,
-                'channel_subscribers': video_info.get('channel_follower_count', 'Unknown'),
-                'likes': f"{video_info.get('like_count', 0):,}" if video_info.get('like_count') else 'Unknown',
-                'comments': f"{video_info.get('comment_count', 0):,}" if video_info.get('comment_count') else 'Unknown',
-                'category': video_info.get('categories', ['Unknown'])[0] if video_info.get('categories') else 'Unknown'
-            }
-            
-            # Format publish date to be more readable if it's in YYYYMMDD format
-            if len(info['publish_date']) == 8 and info['publish_date'].isdigit():
-                try:
-                    publish_date = datetime.datetime.strptime(info['publish_date'], '%Y%m%d')
-                    info['publish_date'] = publish_date.strftime('%Y-%m-%d')
-                except Exception:
-                    pass  # Keep original format if parsing fails
-                    
-            logging.info(f"Processed video information: Title={info['title']}, Channel={info['channel_name']}")
-            return info
-            
+        logging.info("Extracting video information with yt-dlp")
+        def extract():
+            if session is not None:
+                return project_raw_info(session.extract_info(watch_url))
+            with yt_dlp.YoutubeDL(EXTRACTION_PROFILES[profile]['ydl_opts']) as ydl:
+                return project_raw_info(ydl.extract_info(watch_url, download=False,
+                                                         process=EXTRACTION_PROFILES[profile]['process']))
+        
+        video_info = retry.call(extract) if retry is not None else extract()
+        
+        if not video_info:
+            logging.error("yt-dlp couldn't extract video information")
+            return None
+        
+        logging.info(f"Successfully extracted video information: {video_info.get('title')}")
+        
+        # Without post-processing yt-dlp leaves 'thumbnail' unset, the best
+        # entry is the last one in the (preference-sorted) thumbnails list
+        thumbnail_url = video_info.get('thumbnail')
+        if not thumbnail_url and video_info.get('thumbnails'):
+            thumbnail_url = video_info['thumbnails'][-1].get('url')
+        if not thumbnail_url:
+            thumbnail_url = f"https://img.youtube.com/vi/{video_id}/maxresdefault.jpg"
+        
+        # upload_date is also filled in by post-processing when the extractor
+        # only reports a timestamp
+        publish_date = None
+        if video_info.get('upload_date'):
+            try:
+                publish_date = datetime.datetime.strptime(video_info['upload_date'], '%Y%m%d').date()
+            except ValueError:
+                pass
+        elif video_info.get('timestamp'):
+            publish_date = datetime.datetime.fromtimestamp(video_info['timestamp'], datetime.timezone.utc).date()
+        
+        info = VideoRecord(
+            video_id=video_id,
+            title=video_info.get('title', f"YouTube Video {video_id}"),
+            channel_name=video_info.get('uploader'),
+            channel_url=video_info.get('uploader_url', ''),
+            thumbnail_url=thumbnail_url,
+            description=video_info.get('description') or '',
+            publish_date=publish_date,
+            duration=as_duration(video_info.get('duration') or None),
+            category=video_info['categories'][0] if video_info.get('categories') else None,
+            **stats_from_counts(
+                view_count=video_info.get('view_count'),
+                like_count=video_info.get('like_count'),
+                comment_count=video_info.get('comment_count'),
+                subscriber_count=video_info.get('channel_follower_count'),
+            ),
+        )
+        
+        logging.info(f"Processed video information: Title={info.title}, Channel={info.channel_name}")
+        return info
+        
     except Exception as e:
-        logging.error(f"Error getting video info: {e}")
+        kind = classify_error(e)
+        note_failure(kind)
+        logging.error(f"Error getting video info ({kind}): {e}")
         log_exception(e)
         return None
 
-def format_for_markdown(video_info):
-    """Format video information for markdown"""
-    if not video_info:
-        logging.error("No video information to format")
+WATCH_PAGE_URL = "https://www.youtube.com/watch?v={video_id}"
+WATCH_PAGE_HEADERS = {
+    'User-Agent': "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+                  "(KHTML, like Gecko) Chrome/124.0 Safari/537.36",
+    'Accept-Language': "en-US,en;q=0.9",
+}
+VIEW_COUNT_RE = re.compile(r'"viewCount":"(\d+)"')
+LIKE_COUNT_RE = re.compile(r'"likeCountIfIndifferentNumber":"(\d+)"')
+SUBSCRIBER_COUNT_RE = re.compile(r'"subscriberCountText":\{.{0,300}?"simpleText":"([\d.,]+\s*[KMB]?) subscribers"', re.S)
+
+def parse_count(text):
+    """Convert an abbreviated count like '26.6K' or '1,234' to an int"""
+    text = text.replace(',', '').strip()
+    multiplier = {'K': 1_000, 'M': 1_000_000, 'B': 1_000_000_000}.get(text[-1:].upper(), 1)
+    if multiplier > 1:
+        text = text[:-1]
+    return int(float(text) * multiplier)
+
+def fetch_watch_page(video_id, timeout=15):
+    """Download the HTML of a video's watch page"""
+    import urllib.request
+    
+    request = urllib.request.Request(WATCH_PAGE_URL.format(video_id=video_id), headers=WATCH_PAGE_HEADERS)
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        return response.read().decode('utf-8', errors='replace')
+
+def parse_watch_stats(page):
+    """Return the raw counts for stats_from_counts found on a watch page, or None"""
+    views = VIEW_COUNT_RE.search(page)
+    if not views:
         return None
+    likes = LIKE_COUNT_RE.search(page)
+    subscribers = SUBSCRIBER_COUNT_RE.search(page)
     
-    logging.info("Formatting video information for markdown")
+    # The comment count is loaded separately by the page, so it is not available here
+    return {
+        'view_count': int(views.group(1)),
+        'like_count': int(likes.group(1)) if likes else None,
+        'comment_count': None,
+        'subscriber_count': parse_count(subscribers.group(1)) if subscribers else None,
+    }
+
+def fetch_video_stats(video_id, timeout=15):
+    """Fetch only the volatile counters of a video from its watch page
+
+    This is a single HTTP request without yt-dlp, the player JS or any
+    manifests, used to refresh the statistics of videos whose static
+    information is already cached. Returns raw counts for stats_from_counts
+    (None for counters the page did not show), or None if the page could
+    not be read.
+    """
+    logging.info(f"Fetching statistics for video ID: {video_id}")
+    try:
+        page = fetch_watch_page(video_id, timeout)
+    except Exception as e:
+        logging.error(f"Error fetching watch page for {video_id}: {e}")
+        return None
     
-    # Truncate description if too long
-    description = video_info['description']
-    if len(description) > 2000:
-        description = description[:1997] + "..."
+    counts = parse_watch_stats(page)
+    if counts is None:
+        logging.error(f"Could not find the view count on the watch page for {video_id}")
+    return counts
+
+# YouTube Data API v3: every list call costs one quota unit, however many
+# IDs (up to 50) it asks for
+DATA_API_URL = "https://www.googleapis.com/youtube/v3"
+DATA_API_BATCH = 50
+DATA_API_DAILY_QUOTA = 10000
+QUOTA_FILE = "youtube_notes_quota.sqlite"
+ISO_DURATION_RE = re.compile(r'^P(?:(\d+)D)?(?:T(?:(\d+)H)?(?:(\d+)M)?(?:(\d+)S)?)?$')
+THUMBNAIL_SIZES = ('maxres', 'standard', 'high', 'medium', 'default')
+
+class QuotaExceeded(Exception):
+    pass
+
+def quota_day():
+    """Return the current quota day; Data API quotas reset at midnight Pacific time"""
+    try:
+        from zoneinfo import ZoneInfo
+        tz = ZoneInfo('America/Los_Angeles')
+    except Exception:
+        tz = datetime.timezone(datetime.timedelta(hours=-8))
+    return datetime.datetime.now(tz).strftime('%Y-%m-%d')
+
+class QuotaLedger:
+    """Daily Data API quota usage, persisted so that separate runs share one budget"""
     
-    # Build channel name with link if available
-    channel_display = video_info['channel_name']
-    if video_info.get('channel_url'):
-        channel_display = f"[{video_info['channel_name']}]({video_info['channel_url']})"
+    def __init__(self, path=QUOTA_FILE, daily_limit=DATA_API_DAILY_QUOTA):
+        self.path = path
+        self.daily_limit = daily_limit
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self.conn.execute("PRAGMA busy_timeout=30000")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS quota (day TEXT PRIMARY KEY, used INTEGER NOT NULL)")
+    
+    def used(self):
+        with self._lock:
+            row = self.conn.execute("SELECT used FROM quota WHERE day = ?", (quota_day(),)).fetchone()
+        return row[0] if row else 0
     
-    template = f"""# [{video_info['title']}]
+    def spend(self, units=1):
+        """Record units as used, or raise QuotaExceeded if they would go over the limit
 
-<div style="display:flex">
-<div style="flex:40%">
-![Video Thumbnail]({video_info['thumbnail_url']})
-</div>
-<div style="flex:60%">
+        The limit is checked by the same UPDATE that adds the units, inside
+        an IMMEDIATE transaction, so processes sharing the ledger never
+        overwrite each other's spending.
+        """
+        day = quota_day()
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                self.conn.execute("INSERT OR IGNORE INTO quota (day, used) VALUES (?, 0)", (day,))
+                spent = self.conn.execute(
+                    "UPDATE quota SET used = used + ? WHERE day = ? AND used + ? <= ?",
+                    (units, day, units, self.daily_limit)
+                ).rowcount
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+            self.conn.execute("COMMIT")
+        if not spent:
+            raise QuotaExceeded(f"Daily Data API quota of {self.daily_limit} units is used up")
+    
+    def close(self):
+        with self._lock:
+            self.conn.close()
 
-## Quick Facts
-- **Channel:** {channel_display} (Subscribers: {video_info.get('channel_subscribers', 'Unknown')})
-- **Published:** {video_info['publish_date']}
-- **Captured:** {video_info['capture_date']}
-- **Duration:** {video_info['duration']}
-- **Views:** {video_info['views']}
-- **Likes:** {video_info.get('likes', 'Unknown')}
-- **Comments:** {video_info.get('comments', 'Unknown')}
-- **Category:** {video_info.get('category', 'Unknown')}
-- **Personal Rating:** [Add your rating]
+def parse_iso_duration(value):
+    """Return the number of seconds in an ISO 8601 duration such as PT11M46S, or None"""
+    match = ISO_DURATION_RE.match(value or '')
+    if not match:
+        return None
+    days, hours, minutes, seconds = (int(group or 0) for group in match.groups())
+    return ((days * 24 + hours) * 60 + minutes) * 60 + seconds
 
-</div>
-</div>
+class DataAPIBackend:
+    """Get video information from the YouTube Data API v3 (the 'api' backend)
 
-## Description
-{description}
+    videos.list is called with up to 50 IDs at a time and channels.list for
+    the subscriber counts of their channels, so a batch costs one round
+    trip (and a couple of quota units) per 50 videos instead of a page
+    extraction per video. Usage is counted against a QuotaLedger; base_url
+    can point at a local stand-in server.
+    """
+    
+    name = 'api'
+    
+    def __init__(self, api_key, base_url=DATA_API_URL, quota=None, retry=None, timeout=15):
+        self.api_key = api_key
+        self.base_url = base_url.rstrip('/')
+        self.quota = quota
+        self.retry = retry
+        self.timeout = timeout
+        self._prefetched = {}
+        self._subscribers = {}
+        self._categories = {}
+        self._lock = threading.Lock()
+    
+    def _get(self, resource, **params):
+        import urllib.request
+        
+        params['key'] = self.api_key
+        url = f"{self.base_url}/{resource}?{urlencode(params)}"
+        
+        def request():
+            # Google counts failed requests against the quota too
+            if self.quota is not None:
+                self.quota.spend(1)
+            with urllib.request.urlopen(url, timeout=self.timeout) as response:
+                return json.loads(response.read().decode('utf-8'))
+        
+        return self.retry.call(request) if self.retry is not None else request()
+    
+    def fetch_many(self, video_ids):
+        """Return {video_id: info} for the given IDs
 
-## Hashtags
-{video_info.get('hashtags', 'None')}
+        Videos that do not exist or are private are missing from the result.
+        """
+        infos = {}
+        for start in range(0, len(video_ids), DATA_API_BATCH):
+            chunk = video_ids[start:start + DATA_API_BATCH]
+            logging.info(f"Requesting {len(chunk)} videos from the Data API")
+            items = self._get('videos', part='snippet,contentDetails,statistics', id=','.join(chunk)).get('items', [])
+            
+            channel_ids = sorted({item['snippet']['channelId'] for item in items} - set(self._subscribers))
+            if channel_ids:
+                for channel in self._get('channels', part='statistics', id=','.join(channel_ids)).get('items', []):
+                    statistics = channel.get('statistics', {})
+                    hidden = statistics.get('hiddenSubscriberCount')
+                    count = statistics.get('subscriberCount')
+                    self._subscribers[channel['id']] = int(count) if count is not None and not hidden else None
+            
+            category_ids = sorted({item['snippet'].get('categoryId') for item in items}
+                                  - set(self._categories) - {None})
+            if category_ids:
+                for category in self._get('videoCategories', part='snippet', id=','.join(category_ids)).get('items', []):
+                    self._categories[category['id']] = category['snippet']['title']
+            
+            for item in items:
+                infos[item['id']] = self._video_info(item)
+        return infos
+    
+    def _video_info(self, item):
+        """Map a videos.list item onto a VideoRecord"""
+        snippet = item.get('snippet', {})
+        statistics = item.get('statistics', {})
+        video_id = item['id']
+        
+        thumbnails = snippet.get('thumbnails', {})
+        thumbnail_url = next((thumbnails[size]['url'] for size in THUMBNAIL_SIZES if size in thumbnails),
+                             f"https://img.youtube.com/vi/{video_id}/maxresdefault.jpg")
+        
+        def count(field):
+            value = statistics.get(field)
+            return int(value) if value is not None else None
+        
+        return VideoRecord(
+            video_id=video_id,
+            title=snippet.get('title', f"YouTube Video {video_id}"),
+            channel_name=snippet.get('channelTitle'),
+            channel_url=f"https://www.youtube.com/channel/{snippet['channelId']}" if snippet.get('channelId') else '',
+            thumbnail_url=thumbnail_url,
+            description=snippet.get('description') or '',
+            publish_date=as_date((snippet.get('publishedAt') or '')[:10]),
+            duration=as_duration(parse_iso_duration(item.get('contentDetails', {}).get('duration')) or None),
+            category=self._categories.get(snippet.get('categoryId')),
+            **stats_from_counts(
+                view_count=count('viewCount'),
+                like_count=count('likeCount'),
+                comment_count=count('commentCount'),
+                subscriber_count=self._subscribers.get(snippet.get('channelId')),
+            ),
+        )
+    
+    def prefetch(self, urls, cache=None):
+        """Pass urls through, fetching their videos 50 at a time ahead of the consumer
 
-## Link
-[Watch on YouTube](https://youtube.com/watch?v={video_info['video_id']})
+        Videos with a valid cache entry are not requested. fetch() then
+        answers from the prefetched results.
+        """
+        chunk = []
+        for url in urls:
+            chunk.append(url)
+            if len(chunk) >= DATA_API_BATCH:
+                self._prefetch_chunk(chunk, cache)
+                yield from chunk
+                chunk = []
+        if chunk:
+            self._prefetch_chunk(chunk, cache)
+            yield from chunk
+    
+    def _prefetch_chunk(self, urls, cache):
+        video_ids = []
+        for url in urls:
+            video_id = parse_video_id(url)
+            if video_id is None or video_id in video_ids or video_id in self._prefetched:
+                continue
+            if cache is not None and cache.get(video_id) is not None:
+                continue
+            video_ids.append(video_id)
+        if not video_ids:
+            return
+        try:
+            infos = self.fetch_many(video_ids)
+        except Exception as e:
+            logging.error(f"Error prefetching from the Data API: {e}")
+            return
+        with self._lock:
+            for video_id in video_ids:
+                # Missing videos are remembered too, so they are not requested again
+                self._prefetched[video_id] = infos.get(video_id)
+    
+    def fetch(self, url):
+        """Get video information for one URL, like get_video_info"""
+        video_id = extract_video_id(url)
+        with self._lock:
+            if video_id in self._prefetched:
+                info = self._prefetched.pop(video_id)
+                if info is None:
+                    note_failure(PERMANENT)
+                    logging.error(f"The Data API has no video {video_id} (private, removed or never existed)")
+                return info
+        try:
+            info = self.fetch_many([video_id]).get(video_id)
+        except QuotaExceeded as e:
+            logging.error(f"Skipping {video_id}: {e}")
+            return None
+        except Exception as e:
+            kind = classify_error(e)
+            note_failure(kind)
+            logging.error(f"Error getting video info from the Data API ({kind}): {e}")
+            log_exception(e)
+            return None
+        if info is None:
+            note_failure(PERMANENT)
+            logging.error(f"The Data API has no video {video_id} (private, removed or never existed)")
+        return info
 
-## Notes
-[Add your personal notes about the video here]
+# Extraction backends. Every backend has a name and a fetch(url) method
+# that returns a VideoRecord, or None; they never raise. 'auto' tries
+# them in this order until it has measured them.
+AUTO_BACKENDS = ('api', 'yt-dlp', 'watch-page', 'pytube')
+BACKENDS = ('auto',) + AUTO_BACKENDS
 
----
-"""
-    logging.info("Markdown formatting complete")
-    return template
+class YtDlpBackend:
+    """Full metadata extraction with yt-dlp (get_video_info)"""
+    
+    name = 'yt-dlp'
+    
+    def __init__(self, session=None, profile=DEFAULT_PROFILE, retry=None):
+        self.session = session
+        self.profile = profile
+        self.retry = retry
+    
+    def fetch(self, url):
+        if not require_dependencies():
+            return None
+        return get_video_info(url, session=self.session, profile=self.profile, retry=self.retry)
 
-def append_to_notes(markdown_content, filename="AINotesDump.md"):
-    """Append markdown content to the notes file"""
-    try:
-        logging.info(f"Attempting to write to {filename}")
-        # Create the file if it doesn't exist
-        if not os.path.exists(filename):
-            logging.info(f"File {filename} does not exist, creating it")
-            with open(filename, 'w', encoding='utf-8') as f:
-                f.write("")
-            logging.info("File created")
-        
-        # Append content to the file
-        with open(filename, 'a', encoding='utf-8') as f:
-            f.write("\n" + markdown_content)
+OEMBED_URL = "https://www.youtube.com/oembed"
+LENGTH_SECONDS_RE = re.compile(r'"lengthSeconds":"(\d+)"')
+PUBLISH_DATE_RE = re.compile(r'"publishDate":"(\d{4}-\d{2}-\d{2})')
+CATEGORY_RE = re.compile(r'"category":"([^"]+)"')
+SHORT_DESCRIPTION_RE = re.compile(r'"shortDescription":"((?:[^"\\]|\\.)*)"')
+
+class WatchPageBackend:
+    """Scrape video information from the oEmbed endpoint and the watch page
+
+    Two plain HTTP requests and no dependencies: oEmbed gives the title,
+    channel and thumbnail, the watch page's embedded player response the
+    rest. Comment counts are not on the page.
+    """
+    
+    name = 'watch-page'
+    
+    def __init__(self, retry=None, timeout=15):
+        self.retry = retry
+        self.timeout = timeout
+    
+    def _oembed(self, video_id):
+        import urllib.request
         
-        logging.info(f"Successfully appended video information to {filename}")
-        return True
-    except Exception as e:
-        logging.error(f"Error writing to file: {e}")
-        log_exception(e)
-        return False
+        query = urlencode({'format': 'json', 'url': WATCH_PAGE_URL.format(video_id=video_id)})
+        request = urllib.request.Request(f"{OEMBED_URL}?{query}", headers=WATCH_PAGE_HEADERS)
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            return json.loads(response.read().decode('utf-8'))
+    
+    def _call(self, func, *args):
+        return self.retry.call(func, *args) if self.retry is not None else func(*args)
+    
+    def fetch(self, url):
+        try:
+            video_id = extract_video_id(url)
+            oembed = self._call(self._oembed, video_id)
+            page = self._call(fetch_watch_page, video_id, self.timeout)
+            
+            description = SHORT_DESCRIPTION_RE.search(page)
+            length = LENGTH_SECONDS_RE.search(page)
+            publish_date = PUBLISH_DATE_RE.search(page)
+            category = CATEGORY_RE.search(page)
+            
+            return VideoRecord(
+                video_id=video_id,
+                title=oembed.get('title', f"YouTube Video {video_id}"),
+                channel_name=oembed.get('author_name'),
+                channel_url=oembed.get('author_url', ''),
+                thumbnail_url=oembed.get('thumbnail_url') or f"https://img.youtube.com/vi/{video_id}/maxresdefault.jpg",
+                description=json.loads(f'"{description.group(1)}"') if description else '',
+                publish_date=as_date(publish_date.group(1)) if publish_date else None,
+                duration=as_duration(int(length.group(1)) or None) if length else None,
+                category=category.group(1) if category else None,
+                **stats_from_counts(**(parse_watch_stats(page) or {})),
+            )
+        except Exception as e:
+            kind = classify_error(e)
+            note_failure(kind)
+            logging.error(f"Error scraping video info ({kind}): {e}")
+            log_exception(e)
+            return None
 
-def main():
-    logging.info("=== Starting YouTube Notes Generator ===")
+class PytubeBackend:
+    """Video information from pytube, as youtube_notes.py has always done it"""
     
-    # Ensure dependencies are installed
-    if not ensure_dependencies():
-        logging.error("Failed to install required dependencies")
-        return
+    name = 'pytube'
     
-    # Get YouTube URL from command line or input
-    if len(sys.argv) > 1:
-        url = sys.argv[1]
-        logging.info(f"URL provided as command line argument: {url}")
-    else:
-        url = input("Enter YouTube URL: ").strip()
-        logging.info(f"URL provided via input prompt: {url}")
+    def __init__(self, retry=None):
+        self.retry = retry
+    
+    def fetch(self, url):
+        try:
+            from pytube import YouTube
+            
+            video_id = extract_video_id(url)
+            
+            def extract():
+                # pytube fetches lazily, so read every property inside the retry
+                yt = YouTube(WATCH_PAGE_URL.format(video_id=video_id))
+                return yt, yt.title, yt.author, yt.description or '', yt.publish_date, yt.views, yt.length
+            
+            try:
+                yt, title, author, description, publish_date, views, length = (
+                    self.retry.call(extract) if self.retry is not None else extract())
+            except Exception as e:
+                note_failure(classify_error(e))
+                logging.error(f"YouTube connection error: {e}")
+                logging.error("This may be due to YouTube blocking automated requests or pytube needing an update.")
+                return None
+            
+            # Likes, comments, subscribers and category are not exposed by pytube
+            return VideoRecord(
+                video_id=video_id,
+                title=title,
+                channel_name=author,
+                channel_url=getattr(yt, 'channel_url', '') or '',
+                thumbnail_url=f"https://img.youtube.com/vi/{video_id}/maxresdefault.jpg",
+                description=description,
+                publish_date=publish_date.date() if publish_date else None,
+                duration=as_duration(length or None),
+                views=views,
+            )
+        except Exception as e:
+            note_failure(classify_error(e))
+            logging.error(f"Error getting video info with pytube: {e}")
+            log_exception(e)
+            return None
+
+class BackendSelector:
+    """Send each fetch to the fastest healthy backend, falling back to the others
+
+    Latency is tracked per backend as an exponentially weighted moving
+    average over its successful fetches. Backends that have not been
+    measured yet go first, in the order given. A failure only counts
+    against a backend when another backend then succeeded for the same
+    video; when all fail, the video itself is the problem. After
+    max_failures counted failures in a row a backend is benched for
+    cooldown seconds and only used as a last resort; once the cooldown is
+    over a single failure benches it again.
+    """
     
-    logging.info(f"Processing video: {url}")
+    name = 'auto'
     
-    # Get video information
-    video_info = get_video_info(url)
-    if not video_info:
-        logging.error("Failed to get video information")
-        return
+    def __init__(self, backends, max_failures=3, cooldown=300.0, alpha=0.3):
+        self.backends = list(backends)
+        self.max_failures = max_failures
+        self.cooldown = cooldown
+        self.alpha = alpha
+        self.stats = {
+            backend.name: {'latency': None, 'successes': 0, 'failures': 0, 'streak': 0, 'benched_until': 0.0}
+            for backend in self.backends
+        }
+        self._lock = threading.Lock()
     
-    # Format for markdown
-    markdown_content = format_for_markdown(video_info)
-    if not markdown_content:
-        logging.error("Failed to format video information")
-        return
+    def ranked(self):
+        """Return the backends in the order they should be tried"""
+        now = time.monotonic()
+        with self._lock:
+            healthy = [b for b in self.backends if self.stats[b.name]['benched_until'] <= now]
+            benched = [b for b in self.backends if self.stats[b.name]['benched_until'] > now]
+            healthy.sort(key=lambda b: -1 if self.stats[b.name]['latency'] is None else self.stats[b.name]['latency'])
+            benched.sort(key=lambda b: self.stats[b.name]['benched_until'])
+        return healthy + benched
+    
+    def _record_success(self, backend, elapsed):
+        with self._lock:
+            stats = self.stats[backend.name]
+            stats['successes'] += 1
+            stats['streak'] = 0
+            stats['benched_until'] = 0.0
+            if stats['latency'] is None:
+                stats['latency'] = elapsed
+            else:
+                stats['latency'] += self.alpha * (elapsed - stats['latency'])
+    
+    def _record_failure(self, backend):
+        with self._lock:
+            stats = self.stats[backend.name]
+            stats['failures'] += 1
+            stats['streak'] += 1
+            if stats['streak'] >= self.max_failures:
+                logging.warning(f"The {backend.name} backend keeps failing, benching it for {self.cooldown:.0f}s")
+                stats['benched_until'] = time.monotonic() + self.cooldown
+    
+    def fetch(self, url):
+        failed = []
+        for backend in self.ranked():
+            start = time.perf_counter()
+            try:
+                info = backend.fetch(url)
+            except Exception as e:
+                log_exception(e)
+                info = None
+            if info:
+                self._record_success(backend, time.perf_counter() - start)
+                for failed_backend in failed:
+                    self._record_failure(failed_backend)
+                return info
+            logging.warning(f"The {backend.name} backend could not get {url}")
+            failed.append(backend)
+        return None
+    
+    def log_summary(self):
+        for backend in self.backends:
+            stats = self.stats[backend.name]
+            latency = f"{stats['latency']:.2f}s" if stats['latency'] is not None else "-"
+            benched = " (benched)" if stats['benched_until'] > time.monotonic() else ""
+            logging.info(f"Backend {backend.name}: {stats['successes']} fetched, {stats['failures']} failed, "
+                         f"average latency {latency}{benched}")
+
+DEFAULT_HEDGE_PERCENTILE = 95
+DEFAULT_HEDGE_AFTER = 5.0
+HEDGE_MIN_SAMPLES = 20
+
+class DaemonThreadPool:
+    """Minimal executor whose threads do not hold up interpreter exit
+
+    ThreadPoolExecutor joins its threads at exit, which would keep a
+    finished run waiting for an abandoned hedging loser.
+    """
+    
+    def __init__(self, workers):
+        self._queue = queue.Queue()
+        self._threads = [threading.Thread(target=self._run, daemon=True) for _ in range(workers)]
+        for thread in self._threads:
+            thread.start()
+    
+    def submit(self, fn, *args):
+        future = Future()
+        self._queue.put((future, fn, args))
+        return future
+    
+    def _run(self):
+        while True:
+            future, fn, args = self._queue.get()
+            if future is None:
+                return
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(fn(*args))
+            except BaseException as e:
+                future.set_exception(e)
     
-    # Append to notes file
-    append_to_notes(markdown_content)
+    def shutdown(self):
+        for _ in self._threads:
+            self._queue.put((None, None, None))
+
+class HedgedBackend:
+    """Race an alternate backend against a slow primary
+
+    If the primary has not answered by the given percentile of its recent
+    latencies (initial_delay until HEDGE_MIN_SAMPLES are known), the video
+    is requested from the alternate too and the first result wins. A
+    running extraction cannot be interrupted, so the loser is cancelled if
+    it has not started yet and otherwise left to finish in the background
+    with its result discarded; the primary's latency is still recorded.
+    samples seeds the latency history and on_sample is called with every
+    new primary latency, so the history can be kept between runs.
+    """
+    
+    def __init__(self, primary, alternate, percentile=DEFAULT_HEDGE_PERCENTILE,
+                 initial_delay=DEFAULT_HEDGE_AFTER, samples=(), on_sample=None, workers=4):
+        self.name = primary.name
+        self.primary = primary
+        self.alternate = alternate
+        self.percentile = percentile
+        self.initial_delay = initial_delay
+        self.on_sample = on_sample
+        self.latencies = deque(samples, maxlen=LATENCY_SAMPLES)
+        self.hedged = 0
+        self.hedge_wins = 0
+        self._lock = threading.Lock()
+        # Long-lived pools, so per-thread extractor instances stay warm.
+        # Abandoned losers keep a thread busy, hence the headroom.
+        self._primary_pool = DaemonThreadPool(workers * 2)
+        self._alternate_pool = DaemonThreadPool(workers * 2)
+    
+    def deadline(self):
+        """Return how long the primary gets before the alternate is started"""
+        with self._lock:
+            samples = sorted(self.latencies)
+        if len(samples) < HEDGE_MIN_SAMPLES:
+            return self.initial_delay
+        return samples[min(len(samples) - 1, int(len(samples) * self.percentile / 100))]
+    
+    def _record(self, future, start):
+        if future.cancelled() or future.exception() is not None or not future.result():
+            return
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self.latencies.append(elapsed)
+        if self.on_sample is not None:
+            try:
+                self.on_sample(elapsed)
+            except Exception as e:
+                logging.warning(f"Could not record the latency of {self.primary.name}: {e}")
+    
+    def fetch(self, url):
+        start = time.perf_counter()
+        primary = self._primary_pool.submit(self.primary.fetch, url)
+        primary.add_done_callback(lambda future: self._record(future, start))
+        deadline = self.deadline()
+        try:
+            return primary.result(timeout=deadline)
+        except FutureTimeoutError:
+            pass
+        
+        logging.info(f"No answer from {self.primary.name} after {deadline:.1f}s, "
+                     f"also asking {self.alternate.name} for {url}")
+        hedge = self._alternate_pool.submit(self.alternate.fetch, url)
+        with self._lock:
+            self.hedged += 1
+        pending = {primary, hedge}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    info = future.result()
+                except Exception as e:
+                    log_exception(e)
+                    info = None
+                if info:
+                    for loser in pending:
+                        loser.cancel()
+                    if future is hedge:
+                        with self._lock:
+                            self.hedge_wins += 1
+                        logging.info(f"{self.alternate.name} answered first for {url}")
+                    return info
+        return None
+    
+    def close(self):
+        if self.hedged:
+            logging.info(f"Hedged {self.hedged} slow fetches with {self.alternate.name}, "
+                         f"which answered first {self.hedge_wins} times")
+        self._primary_pool.shutdown()
+        self._alternate_pool.shutdown()
+
+CACHE_FILE = "youtube_notes_cache.sqlite"
+DEFAULT_CACHE_TTL_HOURS = 30 * 24
+DEFAULT_STATS_TTL_HOURS = 24
+LATENCY_SAMPLES = 200
+
+class MetadataCache:
+    """Persistent two-tier SQLite cache of video information keyed by video ID
+
+    Static fields (title, channel, dates, duration, thumbnail, description)
+    live in the videos table with a long TTL. The volatile STATS_FIELDS live
+    in the stats table with their own short TTL, so they can be refreshed
+    without a full metadata extraction.
+
+    Every thread gets its own connection. The database runs in WAL mode with
+    a busy timeout, so several processes can share one cache file safely.
+    """
+    
+    def __init__(self, path=CACHE_FILE, ttl_hours=DEFAULT_CACHE_TTL_HOURS,
+                 stats_ttl_hours=DEFAULT_STATS_TTL_HOURS):
+        self.path = path
+        self.ttl = ttl_hours * 3600
+        self.stats_ttl = stats_ttl_hours * 3600
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS videos ("
+                "video_id TEXT PRIMARY KEY, info TEXT NOT NULL, fetched_at REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS stats ("
+                "video_id TEXT PRIMARY KEY, stats TEXT NOT NULL, fetched_at REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS latencies ("
+                "backend TEXT NOT NULL, seconds REAL NOT NULL, recorded_at REAL NOT NULL)"
+            )
+    
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            # Each connection is only used by its own thread, but close() runs on the main thread
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+    
+    def _get(self, table, column, video_id, ttl, allow_expired):
+        row = self._connect().execute(
+            f"SELECT {column}, fetched_at FROM {table} WHERE video_id = ?", (video_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        value, fetched_at = row
+        if not allow_expired and time.time() - fetched_at > ttl:
+            logging.info(f"Cached {table} entry for {video_id} has expired")
+            return None
+        return json.loads(value)
+    
+    def get_static(self, video_id, allow_expired=False):
+        """Return the cached static fields for video_id, or None if missing or expired"""
+        info = self._get('videos', 'info', video_id, self.ttl, allow_expired)
+        if info is not None:
+            for field in STATS_FIELDS:
+                info.pop(field, None)
+        return info
+    
+    def get_stats(self, video_id, allow_expired=False):
+        """Return the cached statistics for video_id, or None if missing or expired"""
+        return self._get('stats', 'stats', video_id, self.stats_ttl, allow_expired)
+    
+    def get(self, video_id, allow_expired=False):
+        """Return the cached VideoRecord, or None unless both tiers are valid"""
+        info = self.get_static(video_id, allow_expired)
+        stats = self.get_stats(video_id, allow_expired) if info is not None else None
+        if stats is None:
+            return None
+        info.update(stats)
+        return VideoRecord.from_dict(info)
+    
+    def put(self, video_id, record):
+        """Store a VideoRecord in both tiers, replacing any previous entry"""
+        info = record.to_dict()
+        static = {field: value for field, value in info.items() if field not in STATS_FIELDS}
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO videos (video_id, info, fetched_at) VALUES (?, ?, ?)",
+                (video_id, json.dumps(static), now)
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO stats (video_id, stats, fetched_at) VALUES (?, ?, ?)",
+                (video_id, json.dumps(self._stats_of(info)), now)
+            )
+    
+    def put_stats(self, video_id, stats):
+        """Store fresh statistics for video_id without touching its static fields"""
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO stats (video_id, stats, fetched_at) VALUES (?, ?, ?)",
+                (video_id, json.dumps(self._stats_of(stats)), time.time())
+            )
+    
+    def stale_stats_ids(self):
+        """Return the IDs of cached videos whose statistics are missing or expired"""
+        rows = self._connect().execute(
+            "SELECT videos.video_id FROM videos LEFT JOIN stats USING (video_id) "
+            "WHERE stats.fetched_at IS NULL OR stats.fetched_at < ? ORDER BY videos.video_id",
+            (time.time() - self.stats_ttl,)
+        ).fetchall()
+        return [row[0] for row in rows]
+    
+    @staticmethod
+    def _stats_of(info):
+        return {field: as_count(info.get(field)) for field in STATS_FIELDS}
+    
+    def record_latency(self, backend, seconds):
+        """Remember how long a fetch from backend took, keeping the latest LATENCY_SAMPLES"""
+        with self._connect() as conn:
+            conn.execute("INSERT INTO latencies (backend, seconds, recorded_at) VALUES (?, ?, ?)",
+                         (backend, seconds, time.time()))
+            conn.execute(
+                "DELETE FROM latencies WHERE backend = ? AND rowid NOT IN "
+                "(SELECT rowid FROM latencies WHERE backend = ? ORDER BY rowid DESC LIMIT ?)",
+                (backend, backend, LATENCY_SAMPLES)
+            )
+    
+    def recent_latencies(self, backend):
+        """Return the latest recorded fetch latencies of backend, oldest first"""
+        rows = self._connect().execute(
+            "SELECT seconds FROM latencies WHERE backend = ? ORDER BY rowid DESC LIMIT ?",
+            (backend, LATENCY_SAMPLES)
+        ).fetchall()
+        return [seconds for seconds, in reversed(rows)]
+    
+    def close(self):
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            conn.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
+
+def refresh_video_stats(video_id, cache):
+    """Refresh only the statistics tier of a cached video
+
+    Counters the watch page does not show keep their previously cached
+    value. Returns the new statistics, or None if they could not be fetched.
+    """
+    counts = fetch_video_stats(video_id)
+    if counts is None:
+        return None
+    
+    stats = stats_from_counts(**counts)
+    previous = cache.get_stats(video_id, allow_expired=True) or {}
+    for field in STATS_FIELDS:
+        if stats[field] is None:
+            stats[field] = as_count(previous.get(field))
+    
+    try:
+        cache.put_stats(video_id, stats)
+    except sqlite3.Error as e:
+        logging.warning(f"Could not cache statistics for {video_id}: {e}")
+    return stats
+
+def refresh_cached_stats(cache, workers=4):
+    """Refresh the statistics of every cached video whose stats have expired
+
+    Returns a list of (video_id, success) tuples.
+    """
+    video_ids = cache.stale_stats_ids()
+    logging.info(f"Refreshing statistics for {len(video_ids)} cached videos with {workers} workers")
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        stats = list(executor.map(lambda video_id: refresh_video_stats(video_id, cache), video_ids))
+    
+    results = [(video_id, s is not None) for video_id, s in zip(video_ids, stats)]
+    succeeded = sum(1 for _, success in results if success)
+    logging.info(f"Refreshed statistics for {succeeded}/{len(results)} videos")
+    return results
+
+def fetch_video_info(url, cache=None, refresh=False, offline=False, session=None, profile=DEFAULT_PROFILE,
+                     retry=None, backend=None):
+    """Get video information, answering from the metadata cache when possible
+
+    If the static fields are cached but the statistics have expired, only
+    the statistics are refreshed. Cache hits never import or call yt-dlp.
+    refresh skips the cache lookup (the fresh result is still stored) and
+    offline never goes to the network, accepting expired entries instead.
+    Cache misses go to backend (any extraction backend, or a
+    BackendSelector) if given, otherwise to get_video_info.
+    """
+    video_id = extract_video_id(url)
+    
+    if cache is not None and not refresh:
+        info = cache.get_static(video_id, allow_expired=offline)
+        if info:
+            stats = cache.get_stats(video_id, allow_expired=offline)
+            if stats is None and not offline:
+                logging.info(f"Cached statistics for {video_id} are stale, refreshing them")
+                stats = refresh_video_stats(video_id, cache)
+            if stats is not None:
+                logging.info(f"Using cached information for video ID: {video_id}")
+                info.update(stats)
+                record = VideoRecord.from_dict(info)
+                record.capture_date = datetime.date.today()
+                return record
+            if not offline:
+                logging.warning(f"Could not refresh statistics for {video_id}, doing a full extraction")
+    
+    if offline:
+        logging.error(f"No cached information for {video_id} and running offline")
+        return None
+    
+    if backend is not None:
+        info = backend.fetch(url)
+    elif not require_dependencies():
+        return None
+    else:
+        info = get_video_info(url, session=session, profile=profile, retry=retry)
+    if info and cache is not None:
+        try:
+            cache.put(video_id, info)
+        except sqlite3.Error as e:
+            logging.warning(f"Could not cache information for {video_id}: {e}")
+    return info
+
+class SingleFlight:
+    """Collapse concurrent fetches of the same video into one
+
+    Wraps a fetch function. Calls are keyed by the video ID, so different
+    URL forms of one video share a key. While a fetch for a video is in
+    flight, further callers wait for its result instead of starting their
+    own; each of them gets a copy of the record, which is theirs to modify.
+    """
+    
+    def __init__(self, fetch):
+        self.fetch = fetch
+        self.shared = 0
+        self._calls = {}
+        self._lock = threading.Lock()
+    
+    def __call__(self, url):
+        try:
+            key = extract_video_id(url)
+        except Exception:
+            key = url
+        
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = Future()
+            else:
+                self.shared += 1
+        
+        if not leader:
+            logging.info(f"Joining the fetch already in flight for video ID: {key}")
+            info = call.result()
+            return dataclasses.replace(info) if info else info
+        
+        try:
+            info = self.fetch(url)
+        except BaseException as e:
+            call.set_exception(e)
+            raise
+        else:
+            call.set_result(info)
+        finally:
+            with self._lock:
+                del self._calls[key]
+        return info
+
+def format_for_markdown(video_info):
+    """Format video information for markdown"""
+    if not video_info:
+        logging.error("No video information to format")
+        return None
+    
+    logging.info("Formatting video information for markdown")
+    
+    # Truncate description if too long
+    description = video_info.description
+    if len(description) > 2000:
+        description = description[:1997] + "..."
+    
+    # Build channel name with link if available
+    channel_display = video_info.channel_name or 'Unknown'
+    if video_info.channel_url:
+        channel_display = f"[{channel_display}]({video_info.channel_url})"
+    
+    def unknown(value):
+        return 'Unknown' if value is None else value
+    
+    hashtags = video_info.hashtags
+    template = f"""# [{video_info.title}]
+
+<div style="display:flex">
+<div style="flex:40%">
+![Video Thumbnail]({video_info.thumbnail_url})
+</div>
+<div style="flex:60%">
+
+## Quick Facts
+- **Channel:** {channel_display} (Subscribers: {unknown(video_info.channel_subscribers)})
+- **Published:** {unknown(video_info.publish_date)}
+- **Captured:** {video_info.capture_date}
+- **Duration:** {video_info.duration or 'Unknown'}
+- **Views:** {video_info.views or 0:,}
+- **Likes:** {f"{video_info.likes:,}" if video_info.likes else 'Unknown'}
+- **Comments:** {f"{video_info.comments:,}" if video_info.comments else 'Unknown'}
+- **Category:** {unknown(video_info.category)}
+- **Personal Rating:** [Add your rating]
+
+</div>
+</div>
+
+## Description
+{description}
+
+## Hashtags
+{' '.join(hashtags) if hashtags else 'None'}
+
+## Link
+[Watch on YouTube](https://youtube.com/watch?v={video_info.video_id})
+
+## Notes
+[Add your personal notes about the video here]
+
+---
+"""
+    logging.info("Markdown formatting complete")
+    return template
+
+NOTE_LINK_RE = re.compile(rb'^\[Watch on YouTube\]\(https?://(?:www\.)?youtube\.com/watch\?v=([\w-]+)\)')
+
+def iter_note_blocks(f, offset=0):
+    """Yield (video_id, offset, data) for every entry in a notes file
+
+    f is a binary file object (or any iterable of byte lines) that is read
+    line by line, so only one entry is held in memory at a time. An entry
+    starts at a '# [' title line and ends with the '---' separator after its
+    Notes section; a title line before the Notes section starts the entry
+    again, so a damaged entry cannot swallow the rest of the file. Entries
+    that are cut off or have no Watch on YouTube link are skipped with a
+    warning naming the line they start on.
+    """
+    def skip(reason):
+        title = lines[0].decode('utf-8', errors='replace').strip()
+        logging.warning(f"Skipping the entry on line {start_line} of {source} ({title}): {reason}")
+    
+    source = getattr(f, 'name', 'the notes')
+    start = None
+    for line_number, line in enumerate(f, 1):
+        if line.startswith(b'# [') and (start is None or not in_notes):
+            if start is not None:
+                skip("the next entry starts before its Notes section")
+            start, start_line, video_id, in_notes, lines = offset, line_number, None, False, []
+        
+        if start is not None:
+            lines.append(line)
+            match = NOTE_LINK_RE.match(line)
+            if match:
+                video_id = match.group(1).decode('ascii')
+            elif line.startswith(b'## Notes'):
+                in_notes = True
+            elif in_notes and line.rstrip(b'\r\n') == b'---':
+                if video_id:
+                    yield video_id, start, b''.join(lines)
+                else:
+                    skip("it has no Watch on YouTube link")
+                start = None
+        
+        offset += len(line)
+    if start is not None:
+        skip("it does not end with a '---' line")
+
+def iter_note_entries(f, offset=0):
+    """Yield (video_id, offset, length, sha256) for every entry in a notes file"""
+    for video_id, start, data in iter_note_blocks(f, offset):
+        yield video_id, start, len(data), hashlib.sha256(data).hexdigest()
+
+# What the template writes until the user fills something in, and the
+# channel written by the old fallback extractor when nothing could be fetched
+NOTES_PLACEHOLDER = '[Add your personal notes about the video here]'
+RATING_PLACEHOLDER = '[Add your rating]'
+FALLBACK_CHANNEL = 'Unknown (Fallback Method)'
+
+NOTE_SECTIONS = ('Quick Facts', 'Description', 'Hashtags', 'Link', 'Notes')
+QUICK_FACT_RE = re.compile(r'^- \*\*([^*]+):\*\* ?(.*)$')
+CHANNEL_FACT_RE = re.compile(r'^(.*) \(Subscribers: ([^()]*)\)$')
+MARKDOWN_LINK_RE = re.compile(r'^\[(.*)\]\((\S*)\)$')
+THUMBNAIL_RE = re.compile(r'^!\[Video Thumbnail\]\((.*)\)$')
+
+@dataclasses.dataclass(slots=True)
+class NoteEntry:
+    """One entry of the notes file, parsed back into a VideoRecord
+
+    hashtags are taken from the Hashtags section, since the description may
+    have been truncated. notes and rating are None while they still hold
+    the template's placeholders, and fallback is set for entries written by
+    the old fallback extractor.
+    """
+    record: VideoRecord
+    offset: int
+    length: int
+    hashtags: list[str] = dataclasses.field(default_factory=list)
+    notes: str | None = None
+    rating: str | None = None
+    fallback: bool = False
+
+def parse_note_entry(video_id, offset, data):
+    """Parse one entry, as yielded by iter_note_blocks, into a NoteEntry
+
+    Reads the output of every version of the template: counts with or
+    without thousands separators, plain or linked channel names and
+    'Unknown' for anything that was not known.
+    """
+    lines = data.decode('utf-8', errors='replace').splitlines()
+    title = lines[0][len('# ['):]
+    if title.endswith(']'):
+        title = title[:-1]
+    
+    sections = {}
+    facts = {}
+    thumbnail_url = ''
+    current = None
+    for line in lines[1:]:
+        heading = line[3:].strip() if line.startswith('## ') else None
+        # Only a later section ends the current one, so '## ' lines in a description or notes stay put
+        if heading in NOTE_SECTIONS and (
+                current is None or NOTE_SECTIONS.index(heading) > NOTE_SECTIONS.index(current)):
+            current = heading
+            sections[current] = []
+        elif current is None:
+            match = THUMBNAIL_RE.match(line)
+            if match:
+                thumbnail_url = match.group(1)
+        elif current == 'Quick Facts':
+            match = QUICK_FACT_RE.match(line)
+            if match:
+                facts[match.group(1)] = match.group(2).strip()
+        else:
+            sections[current].append(line)
+    
+    def text(name):
+        body = sections.get(name, [])
+        if name == 'Notes' and body and body[-1].strip() == '---':
+            body = body[:-1]
+        return '\n'.join(body).strip('\n')
+    
+    def known(value):
+        return None if value in (None, '', 'Unknown') else value
+    
+    channel, subscribers = facts.get('Channel', ''), None
+    match = CHANNEL_FACT_RE.match(channel)
+    if match:
+        channel, subscribers = match.groups()
+    fallback = channel == FALLBACK_CHANNEL
+    channel_url = ''
+    match = MARKDOWN_LINK_RE.match(channel)
+    if match:
+        channel, channel_url = match.groups()
+    
+    record = VideoRecord(
+        video_id=video_id,
+        title=title,
+        channel_name=None if fallback else known(channel),
+        channel_url=channel_url,
+        thumbnail_url=thumbnail_url,
+        description=text('Description'),
+        publish_date=as_date(known(facts.get('Published'))),
+        duration=as_duration(known(facts.get('Duration'))),
+        category=known(facts.get('Category')),
+        views=as_count(known(facts.get('Views'))),
+        likes=as_count(known(facts.get('Likes'))),
+        comments=as_count(known(facts.get('Comments'))),
+        channel_subscribers=as_count(known(subscribers)),
+    )
+    capture_date = as_date(facts.get('Captured'))
+    if capture_date is not None:
+        record.capture_date = capture_date
+    
+    notes = text('Notes')
+    rating = facts.get('Personal Rating')
+    hashtags = text('Hashtags')
+    return NoteEntry(
+        record=record,
+        offset=offset,
+        length=len(data),
+        hashtags=[] if hashtags in ('', 'None') else hashtags.split(),
+        notes=None if notes in ('', NOTES_PLACEHOLDER) else notes,
+        rating=None if rating in (None, '', RATING_PLACEHOLDER) else rating,
+        fallback=fallback,
+    )
+
+def iter_note_records(f, offset=0):
+    """Yield a NoteEntry for every entry in a notes file
+
+    Like iter_note_blocks, f is read line by line and only the current
+    entry is in memory, so this runs in constant memory over dumps of any
+    size. Open the file with a large buffer to read it in big chunks.
+    """
+    for video_id, start, data in iter_note_blocks(f, offset):
+        yield parse_note_entry(video_id, start, data)
+
+class NotesIndex:
+    """Sidecar index mapping video IDs to their entry in the notes file
+
+    Stores the byte offset, length and SHA-256 of every entry in
+    <notes file>.idx, so duplicates can be detected and any entry read
+    without scanning the whole file. The index is updated on every append
+    and rebuilt in one streaming pass whenever the notes file was changed by
+    something else (its size or mtime no longer match). All changes happen
+    inside an IMMEDIATE transaction, which also serializes appends from
+    concurrent processes.
+    """
+    
+    def __init__(self, filename="AINotesDump.md"):
+        self.filename = filename
+        self.path = filename + ".idx"
+        self._lock = threading.RLock()
+        self._depth = 0
+        self.conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+        self.conn.execute("PRAGMA busy_timeout=30000")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "video_id TEXT PRIMARY KEY, offset INTEGER NOT NULL, length INTEGER NOT NULL, hash TEXT NOT NULL)"
+        )
+        self.conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+    
+    @contextlib.contextmanager
+    def locked(self):
+        """Hold the index write lock; nested calls share the outer transaction"""
+        with self._lock:
+            if self._depth == 0:
+                self.conn.execute("BEGIN IMMEDIATE")
+            self._depth += 1
+            try:
+                yield self
+            except BaseException:
+                self._depth -= 1
+                if self._depth == 0:
+                    self.conn.execute("ROLLBACK")
+                raise
+            self._depth -= 1
+            if self._depth == 0:
+                self.conn.execute("COMMIT")
+    
+    def _file_state(self):
+        try:
+            stat = os.stat(self.filename)
+        except FileNotFoundError:
+            return 0, 0
+        return stat.st_size, stat.st_mtime_ns
+    
+    def _save_file_state(self):
+        size, mtime_ns = self._file_state()
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+            [('size', size), ('mtime_ns', mtime_ns)]
+        )
+    
+    def is_stale(self):
+        meta = dict(self.conn.execute("SELECT key, value FROM meta").fetchall())
+        return (meta.get('size'), meta.get('mtime_ns')) != self._file_state()
+    
+    def refresh(self):
+        """Rebuild the index if the notes file changed behind its back"""
+        with self.locked():
+            if self.is_stale():
+                self.rebuild()
+    
+    def rebuild(self):
+        """Re-index the notes file in one streaming pass"""
+        with self.locked():
+            logging.info(f"Rebuilding index {self.path}")
+            self.conn.execute("DELETE FROM entries")
+            count = duplicates = 0
+            seen = set()
+            if os.path.exists(self.filename):
+                with open(self.filename, 'rb') as f:
+                    for video_id, offset, length, digest in iter_note_entries(f):
+                        self.conn.execute(
+                            "INSERT OR REPLACE INTO entries (video_id, offset, length, hash) VALUES (?, ?, ?, ?)",
+                            (video_id, offset, length, digest)
+                        )
+                        count += 1
+                        duplicates += video_id in seen
+                        seen.add(video_id)
+            self._save_file_state()
+            
+            if duplicates:
+                logging.warning(f"{self.filename} contains {duplicates} duplicate entries, the last copy is indexed")
+            logging.info(f"Indexed {count} entries in {self.filename}")
+    
+    def lookup(self, video_id):
+        """Return (offset, length, sha256) of the entry for video_id, or None"""
+        with self.locked():
+            self.refresh()
+            return self.conn.execute(
+                "SELECT offset, length, hash FROM entries WHERE video_id = ?", (video_id,)
+            ).fetchone()
+    
+    def read_entry(self, video_id):
+        """Read the markdown entry for video_id without scanning the notes file"""
+        with self.locked():
+            for attempt in range(2):
+                location = self.lookup(video_id)
+                if location is None:
+                    return None
+                offset, length, digest = location
+                with open(self.filename, 'rb') as f:
+                    f.seek(offset)
+                    data = f.read(length)
+                if hashlib.sha256(data).hexdigest() == digest:
+                    return data.decode('utf-8')
+                logging.warning(f"Index entry for {video_id} does not match {self.filename}")
+                self.rebuild()
+            return None
+    
+    def record_append(self, offset, data):
+        """Index the entries in data, which was just appended at offset"""
+        with self.locked():
+            for video_id, entry_offset, length, digest in iter_note_entries(data.splitlines(keepends=True), offset):
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO entries (video_id, offset, length, hash) VALUES (?, ?, ?, ?)",
+                    (video_id, entry_offset, length, digest)
+                )
+            self._save_file_state()
+    
+    def record_rewrite(self, video_id, offset, old_length, data):
+        """Update the index after the entry at offset was replaced by data
+
+        Entries after it move by the change in length.
+        """
+        with self.locked():
+            delta = len(data) - old_length
+            if delta:
+                self.conn.execute("UPDATE entries SET offset = offset + ? WHERE offset > ?", (delta, offset))
+            self.conn.execute(
+                "INSERT OR REPLACE INTO entries (video_id, offset, length, hash) VALUES (?, ?, ?, ?)",
+                (video_id, offset, len(data), hashlib.sha256(data).hexdigest())
+            )
+            self._save_file_state()
+    
+    def close(self):
+        self.conn.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
+
+def append_to_notes(markdown_content, filename="AINotesDump.md", index=None):
+    """Append markdown content to the notes file
+
+    If a NotesIndex is given the new entry is added to it.
+    """
+    try:
+        logging.info(f"Attempting to write to {filename}")
+        with index.locked() if index is not None else contextlib.nullcontext():
+            # Create the file if it doesn't exist
+            if not os.path.exists(filename):
+                logging.info(f"File {filename} does not exist, creating it")
+                with open(filename, 'w', encoding='utf-8') as f:
+                    f.write("")
+                logging.info("File created")
+            
+            if index is not None:
+                index.refresh()
+            
+            # Append content to the file
+            data = ("\n" + markdown_content).encode('utf-8')
+            with open(filename, 'ab') as f:
+                offset = f.tell()
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            
+            if index is not None:
+                index.record_append(offset, data)
+        
+        logging.info(f"Successfully appended video information to {filename}")
+        return True
+    except Exception as e:
+        logging.error(f"Error writing to file: {e}")
+        log_exception(e)
+        return False
+
+# Quick Facts lines that belong to the user (or to the first capture) and
+# survive a refresh of an existing entry
+PRESERVED_FACTS = ('- **Personal Rating:**', '- **Captured:**')
+
+# Spare bytes reserved in the blank line after the Quick Facts whenever an
+# entry has to be spliced, so later refreshes usually fit in place
+QUICK_FACTS_SLACK = 32
+
+def quick_facts_span(entry):
+    """Return the (start, end) character span of the Quick Facts block in an entry
+
+    The block runs from the '## Quick Facts' heading up to (not including)
+    the newline before the closing </div>, so it also covers the blank line
+    that holds the padding.
+    """
+    start = entry.find('## Quick Facts\n')
+    if start == -1:
+        return None
+    end = entry.find('\n</div>', start)
+    if end == -1:
+        return None
+    return start, end
+
+def merge_quick_facts(old_block, new_block):
+    """Take new_block but keep the PRESERVED_FACTS lines from old_block"""
+    preserved = {}
+    for line in old_block.splitlines():
+        for prefix in PRESERVED_FACTS:
+            if line.startswith(prefix):
+                preserved[prefix] = line
+    
+    lines = []
+    for line in new_block.rstrip(' ').split('\n'):
+        for prefix in PRESERVED_FACTS:
+            if line.startswith(prefix) and prefix in preserved:
+                line = preserved[prefix]
+        lines.append(line)
+    return '\n'.join(lines)
+
+def merge_entry(entry, new_entry):
+    """Take new_entry but keep the user's parts of entry
+
+    The PRESERVED_FACTS lines and everything from the '## Notes' heading on
+    come from entry; the rest is new_entry.
+    """
+    old_span, new_span = quick_facts_span(entry), quick_facts_span(new_entry)
+    if old_span is not None and new_span is not None:
+        block = merge_quick_facts(entry[old_span[0]:old_span[1]], new_entry[new_span[0]:new_span[1]])
+        new_entry = new_entry[:new_span[0]] + block + new_entry[new_span[1]:]
+    old_notes, new_notes = entry.find('\n## Notes\n'), new_entry.find('\n## Notes\n')
+    if old_notes != -1 and new_notes != -1:
+        new_entry = new_entry[:new_notes] + entry[old_notes:]
+    return new_entry
+
+def _copy_range(src, dst, length, chunk_size=1024 * 1024):
+    """Copy length bytes from src to dst in chunks"""
+    while length > 0:
+        chunk = src.read(min(chunk_size, length))
+        if not chunk:
+            break
+        dst.write(chunk)
+        length -= len(chunk)
+
+def quick_facts_patch(entry, video_info):
+    """Work out how to refresh the Quick Facts of entry from video_info
+
+    Returns (block_offset, old_block, block): the byte offset of the Quick
+    Facts block within the entry, its current bytes and the bytes that
+    replace them (merged with merge_quick_facts), or None if either
+    rendering has no Quick Facts.
+    """
+    old_span = quick_facts_span(entry)
+    new_entry = format_for_markdown(video_info)
+    new_span = quick_facts_span(new_entry) if new_entry else None
+    if old_span is None or new_span is None:
+        return None
+    
+    old_block = entry[old_span[0]:old_span[1]].encode('utf-8')
+    block = merge_quick_facts(old_block.decode('utf-8'), new_entry[new_span[0]:new_span[1]]).encode('utf-8')
+    return len(entry[:old_span[0]].encode('utf-8')), old_block, block
+
+def update_entry(video_info, filename, index):
+    """Refresh the Quick Facts of an existing entry in the notes file
+
+    Only the Quick Facts block is regenerated; the title, description, the
+    user's Notes and the PRESERVED_FACTS lines stay as they are. If the new
+    block fits in the old one (padded with spaces on its trailing blank
+    line) only those bytes are overwritten in place. Otherwise the file is
+    rebuilt as a copy-on-write splice into a temporary file that replaces
+    the original atomically, reserving some slack for the next refresh.
+    """
+    video_id = video_info.video_id
+    with index.locked():
+        location = index.lookup(video_id)
+        entry = index.read_entry(video_id)
+        if location is None or entry is None:
+            logging.error(f"Could not read the existing entry for {video_id} from {filename}")
+            return False
+        offset, old_length, _ = location
+        
+        patch = quick_facts_patch(entry, video_info)
+        if patch is None:
+            logging.error(f"Could not find the Quick Facts of {video_id} in {filename}")
+            return False
+        block_offset, old_block, block = patch
+        block_offset += offset
+        
+        if len(block) <= len(old_block):
+            # Overwrite just the Quick Facts bytes, padding the blank line
+            logging.info(f"Updating the Quick Facts of {video_id} in place")
+            block += b' ' * (len(old_block) - len(block))
+            with open(filename, 'r+b') as f:
+                f.seek(block_offset)
+                f.write(block)
+                f.flush()
+                os.fsync(f.fileno())
+        else:
+            logging.info(f"Quick Facts of {video_id} grew, splicing {filename}")
+            block += b' ' * QUICK_FACTS_SLACK
+            directory = os.path.dirname(os.path.abspath(filename))
+            with open(filename, 'rb') as src, tempfile.NamedTemporaryFile(
+                    'wb', dir=directory, prefix=os.path.basename(filename) + '.', delete=False) as dst:
+                try:
+                    _copy_range(src, dst, block_offset)
+                    dst.write(block)
+                    src.seek(block_offset + len(old_block))
+                    shutil.copyfileobj(src, dst)
+                    dst.flush()
+                    os.fsync(dst.fileno())
+                except BaseException:
+                    os.unlink(dst.name)
+                    raise
+            shutil.copymode(filename, dst.name)
+            os.replace(dst.name, filename)
+        
+        new_data = entry.encode('utf-8')
+        new_data = new_data[:block_offset - offset] + block + new_data[block_offset - offset + len(old_block):]
+        index.record_rewrite(video_id, offset, old_length, new_data)
+    
+    logging.info(f"Successfully updated the entry for {video_id} in {filename}")
+    return True
+
+STORE_FILE = "youtube_notes_records.sqlite"
+
+class RecordStore:
+    """Canonical store of every video record written to the notes
+
+    The notes file is a view rendered from these records. Every record is
+    kept as VideoRecord.to_dict() JSON in insertion order, together with
+    the SHA-256 of the markdown it was last rendered to, so
+    regenerate_notes can tell which entries need rendering again without
+    reading the notes file. The first capture date of a video is kept when
+    its record is replaced.
+    """
+    
+    PAGE_SIZE = 500
+    
+    def __init__(self, path=STORE_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        # Shared by the batch writer and the daemon's workers, always under _lock
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA busy_timeout=30000")
+        with self.conn:
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS records ("
+                "seq INTEGER PRIMARY KEY AUTOINCREMENT, video_id TEXT UNIQUE NOT NULL, record TEXT NOT NULL, "
+                "rendered TEXT, updated_at REAL NOT NULL)"
+            )
+    
+    def put(self, record, rendered=None):
+        """Insert or replace the record for record.video_id
+
+        rendered is the SHA-256 of the markdown the record was written as,
+        or None if it still has to be rendered.
+        """
+        data = record.to_dict()
+        with self._lock, self.conn:
+            row = self.conn.execute(
+                "SELECT record FROM records WHERE video_id = ?", (record.video_id,)
+            ).fetchone()
+            if row is not None:
+                data['capture_date'] = json.loads(row[0]).get('capture_date') or data['capture_date']
+            self.conn.execute(
+                "INSERT INTO records (video_id, record, rendered, updated_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (video_id) DO UPDATE SET record = excluded.record, rendered = excluded.rendered, "
+                "updated_at = excluded.updated_at",
+                (record.video_id, json.dumps(data), rendered, time.time())
+            )
+    
+    def get(self, video_id):
+        """Return the VideoRecord for video_id, or None"""
+        with self._lock:
+            row = self.conn.execute("SELECT record FROM records WHERE video_id = ?", (video_id,)).fetchone()
+        return VideoRecord.from_dict(json.loads(row[0])) if row else None
+    
+    def records(self):
+        """Yield (VideoRecord, rendered) for every record in insertion order
+
+        Records are read a page at a time, so memory use does not depend on
+        the size of the store.
+        """
+        seq = 0
+        while True:
+            with self._lock:
+                rows = self.conn.execute(
+                    "SELECT seq, record, rendered FROM records WHERE seq > ? ORDER BY seq LIMIT ?",
+                    (seq, self.PAGE_SIZE)
+                ).fetchall()
+            if not rows:
+                return
+            for seq, data, rendered in rows:
+                yield VideoRecord.from_dict(json.loads(data)), rendered
+    
+    def set_rendered(self, video_ids_and_hashes):
+        """Record the hash each video was last rendered to, from (video_id, sha256) pairs"""
+        with self._lock, self.conn:
+            self.conn.executemany(
+                "UPDATE records SET rendered = ? WHERE video_id = ?",
+                [(digest, video_id) for video_id, digest in video_ids_and_hashes]
+            )
+    
+    def __len__(self):
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM records").fetchone()[0]
+    
+    def close(self):
+        self.conn.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
+
+# Up to this many changed entries are patched one by one with update_entry
+# (or appended) when only their Quick Facts changed; more than that, or
+# anything else changing, and the whole file is rewritten in one pass
+RENDER_PATCH_LIMIT = 64
+
+def quick_facts_only(entry, new_entry):
+    """Return True if merging new_entry into entry only changes its Quick Facts"""
+    merged = merge_entry(entry, new_entry)
+    old_span, new_span = quick_facts_span(entry), quick_facts_span(merged)
+    if old_span is None or new_span is None:
+        return False
+    return entry[:old_span[0]] == merged[:new_span[0]] and entry[old_span[1]:] == merged[new_span[1]:]
+
+def regenerate_notes(store, filename="AINotesDump.md", index=None):
+    """Render the notes file again from the records in a RecordStore
+
+    Only records whose rendering changed (because the record or the
+    template changed) or that have no entry yet are rendered into the file.
+    Existing entries are merged with merge_entry, so the user's Notes,
+    Personal Rating and Captured date survive. When a few entries only
+    have new Quick Facts (refreshed statistics), they are patched with
+    update_entry and new records appended. Otherwise the file is
+    rewritten once, as a streaming copy into a temporary file that replaces
+    the original atomically; records without an entry are appended in
+    store order.
+
+    Returns (rewritten, appended, unchanged) entry counts.
+    """
+    own_index = index is None
+    if own_index:
+        index = NotesIndex(filename)
+    try:
+        with index.locked():
+            index.refresh()
+            changed, unchanged = set(), 0
+            for record, rendered in store.records():
+                digest = hashlib.sha256(format_for_markdown(record).encode('utf-8')).hexdigest()
+                if digest == rendered and index.lookup(record.video_id) is not None:
+                    unchanged += 1
+                else:
+                    changed.add(record.video_id)
+            if not changed:
+                logging.info(f"All {unchanged} entries in {filename} are up to date")
+                return 0, 0, unchanged
+            
+            logging.info(f"Rendering {len(changed)} entries into {filename}")
+            counts = _patch_stale_entries(store, changed, filename, index)
+            if counts is not None:
+                return counts + (unchanged,)
+            rendered, rewritten, appended = {}, 0, 0
+            if not os.path.exists(filename):
+                open(filename, 'wb').close()
+            directory = os.path.dirname(os.path.abspath(filename))
+            with open(filename, 'rb') as scan, open(filename, 'rb') as src, tempfile.NamedTemporaryFile(
+                    'wb', dir=directory, prefix=os.path.basename(filename) + '.', delete=False) as dst:
+                try:
+                    position = 0
+                    for video_id, offset, length, _ in iter_note_entries(scan):
+                        if video_id not in changed:
+                            continue
+                        new_entry = format_for_markdown(store.get(video_id))
+                        rendered[video_id] = hashlib.sha256(new_entry.encode('utf-8')).hexdigest()
+                        _copy_range(src, dst, offset - position)
+                        entry = src.read(length).decode('utf-8')
+                        dst.write(merge_entry(entry, new_entry).encode('utf-8'))
+                        position = offset + length
+                        rewritten += 1
+                    shutil.copyfileobj(src, dst)
+                    
+                    for record, _ in store.records():
+                        if record.video_id in changed and record.video_id not in rendered:
+                            new_entry = format_for_markdown(record)
+                            rendered[record.video_id] = hashlib.sha256(new_entry.encode('utf-8')).hexdigest()
+                            dst.write(("\n" + new_entry).encode('utf-8'))
+                            appended += 1
+                    dst.flush()
+                    os.fsync(dst.fileno())
+                except BaseException:
+                    os.unlink(dst.name)
+                    raise
+            shutil.copymode(filename, dst.name)
+            os.replace(dst.name, filename)
+            index.rebuild()
+            store.set_rendered(rendered.items())
+    finally:
+        if own_index:
+            index.close()
+    
+    logging.info(f"Rewrote {rewritten} and appended {appended} entries in {filename}, {unchanged} were up to date")
+    return rewritten, appended, unchanged
+
+def _patch_stale_entries(store, changed, filename, index):
+    """Bring the changed entries up to date without rewriting the file, if that is cheaper
+
+    Used by regenerate_notes under the index lock. Returns (rewritten,
+    appended), or None when the file has to be rewritten after all: too
+    many changed entries, changes outside the Quick Facts, or more than one
+    entry whose Quick Facts outgrew their padding and would need a splice.
+    """
+    if len(changed) > RENDER_PATCH_LIMIT:
+        return None
+    stale = [video_id for video_id in changed if index.lookup(video_id) is not None]
+    spliced = 0
+    for video_id in stale:
+        entry = index.read_entry(video_id)
+        record = store.get(video_id)
+        if entry is None or not quick_facts_only(entry, format_for_markdown(record)):
+            return None
+        _, old_block, block = quick_facts_patch(entry, record)
+        spliced += len(block) > len(old_block)
+        if spliced > 1:
+            return None
+    
+    rendered, rewritten, appended = {}, 0, 0
+    for video_id in stale:
+        record = store.get(video_id)
+        if not update_entry(record, filename, index):
+            raise OSError(f"Could not update the entry for {video_id} in {filename}")
+        rendered[video_id] = hashlib.sha256(format_for_markdown(record).encode('utf-8')).hexdigest()
+        rewritten += 1
+    for record, _ in store.records():
+        if record.video_id in changed and record.video_id not in rendered:
+            new_entry = format_for_markdown(record)
+            if not append_to_notes(new_entry, filename, index=index):
+                raise OSError(f"Could not append {record.video_id} to {filename}")
+            rendered[record.video_id] = hashlib.sha256(new_entry.encode('utf-8')).hexdigest()
+            appended += 1
+    store.set_rendered(rendered.items())
+    
+    logging.info(f"Patched {rewritten} and appended {appended} entries in {filename}")
+    return rewritten, appended
+
+NOTES_READ_BUFFER = 1024 * 1024
+
+def import_notes(store, filename="AINotesDump.md"):
+    """Seed a RecordStore from the entries of an existing notes file
+
+    Videos the store already has are left alone; when the file has several
+    entries for a video, the last one wins, as in the NotesIndex. Imported
+    records count as rendered, so regenerate_notes leaves their entries
+    as they are until the record or the template changes.
+
+    Returns (imported, skipped) entry counts.
+    """
+    imported, skipped = set(), 0
+    with open(filename, 'rb', buffering=NOTES_READ_BUFFER) as f:
+        for entry in iter_note_records(f):
+            video_id = entry.record.video_id
+            if video_id not in imported and store.get(video_id) is not None:
+                skipped += 1
+                continue
+            rendered = hashlib.sha256(format_for_markdown(entry.record).encode('utf-8')).hexdigest()
+            store.put(entry.record, rendered=rendered)
+            imported.add(video_id)
+    
+    logging.info(f"Imported {len(imported)} records from {filename}, {skipped} were already in the store")
+    return len(imported), skipped
+
+# Quick Facts an entry needs to count as complete. A view count of 0 is
+# what the template writes when the views were not known.
+REPAIR_FIELDS = ('channel_name', 'views', 'duration', 'publish_date')
+
+def missing_fields(record):
+    """Return the REPAIR_FIELDS a VideoRecord has no value for"""
+    return [name for name in REPAIR_FIELDS if not getattr(record, name)]
+
+def find_incomplete_entries(filename="AINotesDump.md"):
+    """Scan a notes file for entries with missing REPAIR_FIELDS
+
+    Returns (incomplete, donors): the IDs of the videos with an incomplete
+    entry, in file order, and a dict of complete records for those of them
+    that also have a complete entry elsewhere in the file, so they can be
+    repaired without fetching anything.
+    """
+    incomplete, complete = {}, set()
+    with open(filename, 'rb', buffering=NOTES_READ_BUFFER) as f:
+        for entry in iter_note_records(f):
+            video_id = entry.record.video_id
+            if missing_fields(entry.record):
+                incomplete[video_id] = None
+            else:
+                complete.add(video_id)
+    
+    donors = {}
+    if complete.intersection(incomplete):
+        with open(filename, 'rb', buffering=NOTES_READ_BUFFER) as f:
+            for entry in iter_note_records(f):
+                if entry.record.video_id in incomplete and not missing_fields(entry.record):
+                    donors[entry.record.video_id] = entry.record
+    return list(incomplete), donors
+
+def patch_quick_facts(records, filename="AINotesDump.md", index=None):
+    """Refresh the Quick Facts of every incomplete entry for the videos in records
+
+    records maps video IDs to VideoRecords. Complete entries are left
+    alone, even when they are for one of those videos. Blocks that fit are
+    overwritten in place as in update_entry; if any grew, the file is
+    spliced once, in a single streaming pass. Returns the number of
+    entries patched.
+    """
+    own_index = index is None
+    if own_index:
+        index = NotesIndex(filename)
+    try:
+        with index.locked():
+            # Entries are located again under the lock, the file may have changed while fetching
+            patches = []
+            with open(filename, 'rb', buffering=NOTES_READ_BUFFER) as f:
+                for video_id, offset, data in iter_note_blocks(f):
+                    if video_id not in records or not missing_fields(parse_note_entry(video_id, offset, data).record):
+                        continue
+                    patch = quick_facts_patch(data.decode('utf-8'), records[video_id])
+                    if patch is None:
+                        logging.error(f"Could not find the Quick Facts of {video_id} in {filename}")
+                        continue
+                    block_offset, old_block, block = patch
+                    patches.append((offset + block_offset, old_block, block))
+            if not patches:
+                return 0
+            
+            grown = [patch for patch in patches if len(patch[2]) > len(patch[1])]
+            with open(filename, 'r+b') as f:
+                for block_offset, old_block, block in patches:
+                    if len(block) <= len(old_block):
+                        f.seek(block_offset)
+                        f.write(block + b' ' * (len(old_block) - len(block)))
+                f.flush()
+                os.fsync(f.fileno())
+            
+            if grown:
+                logging.info(f"The Quick Facts of {len(grown)} entries grew, splicing {filename}")
+                directory = os.path.dirname(os.path.abspath(filename))
+                with open(filename, 'rb') as src, tempfile.NamedTemporaryFile(
+                        'wb', dir=directory, prefix=os.path.basename(filename) + '.', delete=False) as dst:
+                    try:
+                        position = 0
+                        for block_offset, old_block, block in grown:
+                            _copy_range(src, dst, block_offset - position)
+                            dst.write(block + b' ' * QUICK_FACTS_SLACK)
+                            src.seek(block_offset + len(old_block))
+                            position = block_offset + len(old_block)
+                        shutil.copyfileobj(src, dst)
+                        dst.flush()
+                        os.fsync(dst.fileno())
+                    except BaseException:
+                        os.unlink(dst.name)
+                        raise
+                shutil.copymode(filename, dst.name)
+                os.replace(dst.name, filename)
+            index.rebuild()
+    finally:
+        if own_index:
+            index.close()
+    
+    logging.info(f"Patched the Quick Facts of {len(patches)} entries in {filename}")
+    return len(patches)
+
+def repair_notes(fetch, filename="AINotesDump.md", index=None, workers=4, prefetch=None, store=None):
+    """Re-fetch the videos whose entries have missing fields and patch their Quick Facts
+
+    Only videos with an incomplete entry are fetched, on a pool of workers
+    threads (prefetch, from open_pipeline, can fetch them ahead in bulk).
+    Videos that also have a complete entry are repaired from it instead.
+    Complete entries are never fetched or rewritten. With a RecordStore
+    the repaired records are saved there as well.
+
+    Returns a list of (url, success, message, elapsed_seconds) tuples, as
+    for log_batch_summary.
+    """
+    incomplete, donors = find_incomplete_entries(filename)
+    to_fetch = [video_id for video_id in incomplete if video_id not in donors]
+    logging.info(f"{len(incomplete)} videos have incomplete entries in {filename}; fetching {len(to_fetch)}, "
+                 f"repairing {len(donors)} from their complete entries")
+    
+    def timed_fetch(url):
+        start = time.perf_counter()
+        return fetch(url), time.perf_counter() - start
+    
+    urls = [WATCH_PAGE_URL.format(video_id=video_id) for video_id in to_fetch]
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        fetched = list(executor.map(timed_fetch, prefetch(urls) if prefetch is not None else urls))
+    
+    records, results = dict(donors), []
+    for url, (video_info, elapsed) in zip(urls, fetched):
+        if not video_info:
+            results.append((url, False, "Failed to get video information", elapsed))
+            continue
+        records[video_info.video_id] = video_info
+        still_missing = missing_fields(video_info)
+        message = video_info.title + (f" (still missing {', '.join(still_missing)})" if still_missing else "")
+        results.append((url, True, message, elapsed))
+    for video_id in donors:
+        results.append((WATCH_PAGE_URL.format(video_id=video_id), True, "Copied from its complete entry", 0.0))
+    
+    if records:
+        patch_quick_facts(records, filename, index=index)
+        if store is not None:
+            # Only the Quick Facts were patched, so these stay unrendered for the render command
+            for record in records.values():
+                store.put(record)
+    return results
+
+def read_urls(source):
+    """Read URLs from a file, or from stdin when source is '-'
+
+    Blank lines and lines starting with '#' are ignored.
+    """
+    logging.info(f"Reading URLs from {'stdin' if source == '-' else source}")
+    if source == '-':
+        lines = sys.stdin.read().splitlines()
+    else:
+        with open(source, 'r', encoding='utf-8') as f:
+            lines = f.read().splitlines()
+    
+    urls = [line.strip() for line in lines]
+    urls = [url for url in urls if url and not url.startswith('#')]
+    logging.info(f"Read {len(urls)} URLs")
+    return urls
+
+def write_entry(video_info, filename="AINotesDump.md", index=None, markdown_content=None, store=None):
+    """Format video information and append it to the notes file
+
+    markdown_content can be passed in when the entry was already rendered
+    (for example by a batch worker). With a NotesIndex, videos that already
+    have an entry get their Quick Facts refreshed in place instead of a
+    second copy. With a RecordStore the record is saved there first, so it
+    is kept even if the notes file cannot be written.
+    Returns (success, message) where message is the video title on success.
+    """
+    if not video_info:
+        logging.error("Failed to get video information")
+        return False, "Failed to get video information"
+    
+    # Format for markdown
+    if markdown_content is None:
+        markdown_content = format_for_markdown(video_info)
+    if not markdown_content:
+        logging.error("Failed to format video information")
+        return False, "Failed to format video information"
+    
+    if store is not None:
+        store.put(video_info)
+    
+    with index.locked() if index is not None else contextlib.nullcontext():
+        if index is not None and index.lookup(video_info.video_id):
+            logging.info(f"{video_info.video_id} is already in {filename}, updating its entry")
+            if not update_entry(video_info, filename, index):
+                return False, f"Failed to update the entry in {filename}"
+            # Only the Quick Facts were refreshed, so the stored record stays
+            # unrendered until the render command brings the rest of the entry up to date
+            return True, f"{video_info.title} (updated)"
+        
+        # Append to notes file
+        if not append_to_notes(markdown_content, filename, index=index):
+            return False, f"Failed to write to {filename}"
+    
+    if store is not None:
+        store.set_rendered([(video_info.video_id, hashlib.sha256(markdown_content.encode('utf-8')).hexdigest())])
+    return True, video_info.title
+
+BATCH_JOURNAL_FILE = "youtube_notes_batch.journal"
+
+class JobJournal:
+    """Append-only, crash-safe record of a batch's progress per URL
+
+    Every line is a JSON object {"url", "state", "time"[, "message"]} and
+    the last line for a URL is its current state: pending, fetched,
+    rendered, written or failed. 'written' records are fsynced right after
+    the entry itself was fsynced to the notes file, the other states are
+    only flushed, so after a crash the journal never claims more than what
+    is on disk. A torn last line is ignored when the journal is read back.
+    """
+    
+    def __init__(self, path=BATCH_JOURNAL_FILE, resume=False):
+        self.path = path
+        self.states = self.load(path) if resume else {}
+        self._lock = threading.Lock()
+        if resume:
+            done = sum(1 for state in self.states.values() if state == 'written')
+            logging.info(f"Resuming from {path}: {done} URLs already written, "
+                         f"{len(self.states) - done} to retry")
+        elif os.path.exists(path):
+            logging.info(f"Starting a new journal in {path}")
+        self.f = open(path, 'a' if resume else 'w', encoding='utf-8')
+    
+    @staticmethod
+    def load(path):
+        """Return {url: last state} from an existing journal"""
+        states = {}
+        if not os.path.exists(path):
+            return states
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                    states[record['url']] = record['state']
+                except (ValueError, KeyError, TypeError):
+                    logging.warning(f"Ignoring damaged journal line in {path}")
+        return states
+    
+    def is_done(self, url):
+        return self.states.get(url) == 'written'
+    
+    def record(self, url, state, message=None, sync=False):
+        record = {'url': url, 'state': state, 'time': time.time()}
+        if message:
+            record['message'] = message
+        with self._lock:
+            self.states[url] = state
+            self.f.write(json.dumps(record) + "\n")
+            self.f.flush()
+            if sync:
+                os.fsync(self.f.fileno())
+    
+    def close(self):
+        with self._lock:
+            self.f.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
+
+def fetch_and_render(fetch, url, journal=None):
+    """Fetch and render one video, in a batch worker thread
+
+    Returns (video_info, markdown_content, elapsed_seconds, failure), where
+    failure is the failure class the fetch noted, or None.
+    """
+    start = time.perf_counter()
+    take_failure()
+    video_info = fetch(url)
+    markdown_content = None
+    failure = None if video_info else take_failure()
+    if video_info:
+        if journal is not None:
+            journal.record(url, 'fetched')
+        markdown_content = format_for_markdown(video_info)
+        if markdown_content and journal is not None:
+            journal.record(url, 'rendered')
+    return video_info, markdown_content, time.perf_counter() - start, failure
+
+def process_batch(urls, fetch=get_video_info, workers=4, filename="AINotesDump.md", index=None, journal=None,
+                  store=None, executor=None, failures=None):
+    """Process many URLs, fetching video information concurrently
+
+    fetch (get_video_info, or fetch_video_info with its options bound) runs
+    on a bounded thread pool, which also renders the entries. urls may be
+    any iterable, including a lazy generator such as expand_urls: only a
+    small window of URLs is pulled ahead of the writer, so the first entries
+    are written long before the input is exhausted. Entries are appended in
+    input order, so the notes file always has the same order as the input.
+
+    With a JobJournal every URL's progress is recorded, and URLs the journal
+    already has as written (from an interrupted run) are skipped. With a
+    RecordStore every fetched record is saved there as well. A long-lived
+    executor can be passed in to reuse its threads (and their yt-dlp
+    instances) across batches; it is left running. With a failures dict,
+    the failure class (TRANSIENT, THROTTLED or PERMANENT) of every URL
+    whose fetch failed is stored in it.
+
+    Returns a list of (url, success, message, elapsed_seconds) tuples in
+    input order.
+    """
+    logging.info(f"Processing batch with {workers} workers")
+    results = []
+    pending = deque()
+    urls = iter(urls)
+    
+    pool = contextlib.nullcontext(executor) if executor is not None else ThreadPoolExecutor(max_workers=workers)
+    with pool as executor:
+        while True:
+            # Keep every worker busy, plus one queued URL each
+            for url in urls:
+                if journal is not None and journal.is_done(url):
+                    pending.append((url, None))
+                    continue
+                if journal is not None:
+                    journal.record(url, 'pending')
+                pending.append((url, executor.submit(fetch_and_render, fetch, url, journal)))
+                if len(pending) >= workers * 2:
+                    break
+            if not pending:
+                break
+            
+            # Consume results in submission order to keep the output deterministic
+            url, future = pending.popleft()
+            if future is None:
+                results.append((url, True, "Already written (resumed)", 0.0))
+                continue
+            try:
+                video_info, markdown_content, elapsed, failure = future.result()
+            except Exception as e:
+                log_exception(e)
+                video_info, markdown_content, elapsed, failure = None, None, 0.0, None
+            if failure is not None and failures is not None:
+                failures[url] = failure
+            
+            success, message = write_entry(video_info, filename, index=index, markdown_content=markdown_content,
+                                           store=store)
+            results.append((url, success, message, elapsed))
+            if journal is not None:
+                journal.record(url, 'written' if success else 'failed', message, sync=success)
+    
+    return results
+
+SUMMARY_HISTORY = 20
+
+def log_batch_summary(results, retry=None):
+    """Log a per-URL success/failure summary for a batch run
+
+    With the run's RetryPolicy, throttling pauses and the adaptive
+    concurrency limit's history are reported too.
+    """
+    succeeded = sum(1 for _, success, _, _ in results if success)
+    logging.info("=== Batch summary ===")
+    for url, success, message, elapsed in results:
+        status = "OK    " if success else "FAILED"
+        logging.info(f"{status} {url} - {message} ({elapsed:.2f}s)")
+    logging.info(f"{succeeded}/{len(results)} videos processed successfully, {len(results) - succeeded} failed")
+    
+    # Per-video fetch latency, used to compare runs with and without extractor reuse
+    latencies = sorted(elapsed for _, _, _, elapsed in results)
+    if latencies:
+        mean = sum(latencies) / len(latencies)
+        median = latencies[len(latencies) // 2]
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+        logging.info(f"Fetch latency per video: mean={mean:.2f}s median={median:.2f}s p95={p95:.2f}s")
+    
+    if retry is not None and retry.breaker is not None and retry.breaker.trips:
+        logging.info(f"Paused {retry.breaker.trips} times because YouTube was throttling requests")
+    limiter = retry.limiter if retry is not None else None
+    if limiter is not None:
+        logging.info(f"Concurrency limit: {limiter.limit} (range {limiter.minimum}-{limiter.maximum}, "
+                     f"{len(limiter.history) - 1} changes, last {SUMMARY_HISTORY} shown)")
+        for offset, limit, reason in limiter.history[-SUMMARY_HISTORY:]:
+            logging.info(f"  {offset:7.1f}s  {limit:3d}  {reason}")
+
+SYNC_STATE_FILE = "youtube_notes_sync.sqlite"
+DEFAULT_SYNC_LIMIT = 50
+
+class ChannelSyncState:
+    """High-water marks for the sync command, one row per followed channel
+
+    The mark is the newest video ID (and its upload date, when yt-dlp lists
+    one) that has been written to the notes.
+    """
+    
+    def __init__(self, path=SYNC_STATE_FILE):
+        self.path = path
+        self.conn = sqlite3.connect(path, timeout=30)
+        self.conn.execute("PRAGMA busy_timeout=30000")
+        with self.conn:
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS channels ("
+                "channel_url TEXT PRIMARY KEY, last_video_id TEXT, last_upload_date TEXT, synced_at REAL)"
+            )
+    
+    def channels(self):
+        """Return the URLs of every followed channel"""
+        return [row[0] for row in self.conn.execute("SELECT channel_url FROM channels ORDER BY channel_url")]
+    
+    def follow(self, channel_url):
+        with self.conn:
+            self.conn.execute("INSERT OR IGNORE INTO channels (channel_url) VALUES (?)", (channel_url,))
+    
+    def get_mark(self, channel_url):
+        """Return (last_video_id, last_upload_date), both None if never synced"""
+        row = self.conn.execute(
+            "SELECT last_video_id, last_upload_date FROM channels WHERE channel_url = ?", (channel_url,)
+        ).fetchone()
+        return tuple(row) if row else (None, None)
+    
+    def set_mark(self, channel_url, video_id, upload_date=None):
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO channels (channel_url, last_video_id, last_upload_date, synced_at) "
+                "VALUES (?, ?, ?, ?)",
+                (channel_url, video_id, upload_date, time.time())
+            )
+    
+    def close(self):
+        self.conn.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
+
+def new_channel_uploads(channel_url, last_video_id=None, last_upload_date=None, limit=DEFAULT_SYNC_LIMIT):
+    """List the uploads newer than a channel's high-water mark, newest first
+
+    Pages through the channel's Videos tab only until the marked video (or
+    an older upload date) shows up, so the cost depends on the number of new
+    videos rather than on the size of the channel. Stops after limit
+    entries.
+    """
+    entries = []
+    for entry in iter_collection_entries(channel_url):
+        if entry['id'] == last_video_id:
+            break
+        upload_date = entry.get('upload_date')
+        if last_upload_date and upload_date and upload_date < last_upload_date:
+            break
+        entries.append(entry)
+        if len(entries) >= limit:
+            if last_video_id:
+                logging.warning(f"More than {limit} new uploads on {channel_url}, older ones are skipped")
+            break
+    return entries
+
+def sync_channel(channel_url, state, process, limit=DEFAULT_SYNC_LIMIT, initial=0):
+    """Add a channel's new uploads to the notes and advance its mark
+
+    process(urls) writes the given watch URLs and returns the batch results
+    and a dict of failure classes, as process_batch fills it. New uploads
+    are processed oldest first. The mark only moves past uploads that were
+    written or failed permanently (private, removed...), so a video that
+    failed for a transient reason is retried on the next sync. The first sync of a channel only adds its initial newest uploads
+    and then starts following it from there.
+    """
+    last_video_id, last_upload_date = state.get_mark(channel_url)
+    first_sync = last_video_id is None
+    
+    # A first sync also lists the upload just below its initial window
+    entries = new_channel_uploads(channel_url, last_video_id, last_upload_date,
+                                  limit=initial + 1 if first_sync else limit)
+    if not entries:
+        logging.info(f"No new uploads on {channel_url}")
+        return []
+    
+    mark = None
+    if first_sync:
+        logging.info(f"First sync of {channel_url}, adding its {initial} newest uploads")
+        # Following starts below the window, so uploads in it that fail are retried
+        if len(entries) > initial:
+            mark = entries[initial]
+        entries = entries[:initial]
+    else:
+        logging.info(f"{len(entries)} new uploads on {channel_url}")
+    
+    # Oldest first, so the notes stay in upload order
+    entries.reverse()
+    urls = [f"https://www.youtube.com/watch?v={entry['id']}" for entry in entries]
+    results, failures = process(urls) if urls else ([], {})
+    
+    for entry, (url, success, _, _) in zip(entries, results):
+        if not success:
+            # A video that will never load must not pin the mark
+            if failures.get(url) != PERMANENT:
+                break
+            logging.warning(f"Skipping {url} on {channel_url} for good, it failed permanently")
+        mark = entry
+    if mark is not None:
+        state.set_mark(channel_url, mark['id'], mark.get('upload_date'))
+    return results
+
+DEFAULT_HOST_RATE = 2.0
+DEFAULT_HOST_BURST = 4
+DEFAULT_FETCH_TIMEOUT = 60
+
+# Thumbnail sizes to try, best first, when a maxresdefault image does not exist
+THUMBNAIL_FALLBACKS = ('maxresdefault', 'sddefault', 'hqdefault')
+
+class TokenBucket:
+    """Token bucket for asyncio code: rate requests per second, bursts up to burst"""
+    
+    def __init__(self, rate, burst):
+        import asyncio
+        
+        self.rate = rate
+        self.capacity = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+    
+    async def acquire(self):
+        import asyncio
+        
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+class HostRateLimiter:
+    """One TokenBucket per remote host, created on first use"""
+    
+    def __init__(self, rate=DEFAULT_HOST_RATE, burst=DEFAULT_HOST_BURST):
+        self.rate = rate
+        self.burst = burst
+        self.buckets = {}
+    
+    async def acquire(self, url):
+        host = urlparse(url).netloc.lower()
+        if host not in self.buckets:
+            self.buckets[host] = TokenBucket(self.rate, self.burst)
+        await self.buckets[host].acquire()
+
+def check_thumbnail(url, timeout=10):
+    """Return True if a HEAD request for the thumbnail URL succeeds"""
+    import urllib.request
+    
+    try:
+        request = urllib.request.Request(url, method='HEAD', headers=WATCH_PAGE_HEADERS)
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return response.status == 200
+    except Exception as e:
+        logging.debug(f"Thumbnail check failed for {url}: {e}")
+        return False
+
+async def resolve_thumbnail(video_info, limiter, executor):
+    """Make sure the thumbnail URL exists, falling back to smaller sizes
+
+    Returns True if the thumbnail URL was changed.
+    """
+    import asyncio
+    
+    url = video_info.thumbnail_url
+    candidates = [url]
+    if 'maxresdefault' in url:
+        candidates += [url.replace('maxresdefault', size) for size in THUMBNAIL_FALLBACKS[1:]]
+    
+    loop = asyncio.get_running_loop()
+    for candidate in candidates:
+        await limiter.acquire(candidate)
+        if await loop.run_in_executor(executor, check_thumbnail, candidate):
+            if candidate != url:
+                logging.info(f"Using thumbnail {candidate} for {video_info.video_id}")
+                video_info.thumbnail_url = candidate
+                return True
+            return False
+    logging.warning(f"No thumbnail found for {video_info.video_id}, keeping {url}")
+    return False
+
+async def ingest_batch(urls, fetch, cache=None, index=None, filename="AINotesDump.md",
+                       concurrency=4, rate=DEFAULT_HOST_RATE, burst=DEFAULT_HOST_BURST,
+                       timeout=DEFAULT_FETCH_TIMEOUT, journal=None, store=None):
+    """Asyncio version of process_batch for very large batches
+
+    At most concurrency videos are in flight at once, and every request to a
+    remote host first takes a token from that host's bucket, so we stay
+    under YouTube's throttling thresholds. The blocking fetch, thumbnail
+    checks and file writes run in a thread pool, but every video has its own
+    timeout, so one slow video never stalls the batch. Like process_batch,
+    urls may be a lazy iterable (it is advanced in a worker thread), entries
+    are written in input order and a JobJournal is kept the same way.
+
+    Returns a list of (url, success, message, elapsed_seconds) tuples in
+    input order.
+    """
+    import asyncio
+    
+    logging.info(f"Ingesting URLs asynchronously, {concurrency} at a time, "
+                 f"{rate:g} requests/s per host")
+    loop = asyncio.get_running_loop()
+    semaphore = asyncio.Semaphore(concurrency)
+    limiter = HostRateLimiter(rate, burst)
+    # Timed-out fetches keep their thread until yt-dlp gives up, so leave headroom
+    executor = ThreadPoolExecutor(max_workers=concurrency * 2)
+    # File writes go through their own single thread, in order, and so
+    # does pulling URLs from a (possibly network-backed) generator
+    writer = ThreadPoolExecutor(max_workers=1)
+    lister = ThreadPoolExecutor(max_workers=1)
+    urls = iter(urls)
+    
+    async def fetch_one(url):
+        async with semaphore:
+            start = time.perf_counter()
+            video_id = extract_video_id(url)
+            
+            # Cache hits do not count against the rate limit
+            cached = await loop.run_in_executor(executor, cache.get, video_id) if cache is not None else None
+            if not cached:
+                await limiter.acquire(WATCH_PAGE_URL.format(video_id=video_id))
+            
+            try:
+                video_info = await asyncio.wait_for(loop.run_in_executor(executor, fetch, url), timeout)
+            except asyncio.TimeoutError:
+                logging.error(f"Timed out after {timeout}s fetching {url}")
+                return None, None, f"Timed out after {timeout}s", time.perf_counter() - start
+            if not video_info:
+                return None, None, None, time.perf_counter() - start
+            if journal is not None:
+                journal.record(url, 'fetched')
+            
+            if not cached:
+                try:
+                    changed = await asyncio.wait_for(resolve_thumbnail(video_info, limiter, executor), timeout)
+                    if changed and cache is not None:
+                        await loop.run_in_executor(executor, cache.put, video_info.video_id, video_info)
+                except asyncio.TimeoutError:
+                    logging.warning(f"Timed out checking the thumbnail of {url}")
+            
+            markdown_content = format_for_markdown(video_info)
+            if markdown_content and journal is not None:
+                journal.record(url, 'rendered')
+            return video_info, markdown_content, None, time.perf_counter() - start
+    
+    pending = deque()
+    results = []
+    try:
+        while True:
+            # Keep a window of videos in flight ahead of the writer
+            while len(pending) < concurrency * 2:
+                url = await loop.run_in_executor(lister, next, urls, None)
+                if url is None:
+                    break
+                if journal is not None and journal.is_done(url):
+                    pending.append((url, None))
+                    continue
+                if journal is not None:
+                    journal.record(url, 'pending')
+                pending.append((url, asyncio.ensure_future(fetch_one(url))))
+            if not pending:
+                break
+            
+            url, task = pending.popleft()
+            if task is None:
+                results.append((url, True, "Already written (resumed)", 0.0))
+                continue
+            try:
+                video_info, markdown_content, error, elapsed = await task
+            except Exception as e:
+                log_exception(e)
+                video_info, markdown_content, error, elapsed = None, None, str(e), 0.0
+            
+            if error:
+                success, message = False, error
+            else:
+                success, message = await loop.run_in_executor(
+                    writer, functools.partial(write_entry, video_info, filename, index=index,
+                                              markdown_content=markdown_content, store=store))
+            results.append((url, success, message, elapsed))
+            if journal is not None:
+                journal.record(url, 'written' if success else 'failed', message, sync=success)
+    finally:
+        for _, task in pending:
+            # URLs already written by an earlier run are queued without a task
+            if task is not None:
+                task.cancel()
+        executor.shutdown(wait=False, cancel_futures=True)
+        lister.shutdown(wait=False, cancel_futures=True)
+        writer.shutdown(wait=True)
+    
+    return results
+
+def process_batch_async(urls, fetch, cache=None, index=None, filename="AINotesDump.md", **kwargs):
+    """Run ingest_batch on a new event loop"""
+    import asyncio
+    
+    return asyncio.run(ingest_batch(urls, fetch, cache=cache, index=index, filename=filename, **kwargs))
+
+def benchmark_profiles(urls, profiles=('full', 'notes')):
+    """Compare extraction profiles on the same URLs
+
+    Every profile gets its own fresh session and fetches all URLs
+    sequentially. Returns a list of (profile, succeeded, wall_seconds,
+    bytes_received) tuples and logs them as a table.
+    """
+    logging.info(f"Benchmarking extraction profiles {', '.join(profiles)} on {len(urls)} URLs")
+    rows = []
+    for profile in profiles:
+        succeeded = 0
+        with ExtractorSession(profile=profile, count_bytes=True) as session:
+            start = time.perf_counter()
+            for url in urls:
+                if get_video_info(url, session=session):
+                    succeeded += 1
+            wall = time.perf_counter() - start
+            rows.append((profile, succeeded, wall, session.bytes_received))
+    
+    logging.info("=== Extraction profile benchmark ===")
+    logging.info(f"{'profile':<8} {'ok':>5} {'wall (s)':>10} {'s/video':>8} {'KiB':>10}")
+    for profile, succeeded, wall, bytes_received in rows:
+        per_video = wall / len(urls) if urls else 0.0
+        logging.info(f"{profile:<8} {succeeded:>5} {wall:>10.2f} {per_video:>8.2f} {bytes_received / 1024:>10.1f}")
+    return rows
+
+class NotesServer:
+    """Job queue and warm worker pool behind the serve command
+
+    URLs are queued and processed by a fixed set of worker threads that share
+    one extractor session, metadata cache and notes index for the lifetime
+    of the process, so submissions are acknowledged immediately and never pay
+    the start-up cost again.
+    """
+    
+    MAX_FINISHED_JOBS = 1000
+    
+    def __init__(self, fetch, index, filename="AINotesDump.md", workers=2, store=None):
+        self.fetch = fetch
+        self.index = index
+        self.filename = filename
+        self.store = store
+        self.jobs = OrderedDict()
+        self.queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._threads = [
+            threading.Thread(target=self._worker, name=f"notes-worker-{i}", daemon=True)
+            for i in range(workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+    
+    def submit(self, url):
+        """Queue a URL and return a snapshot of its job"""
+        import uuid
+        
+        job = {
+            'id': uuid.uuid4().hex,
+            'url': url,
+            'status': 'queued',
+            'message': None,
+            'entry': None,
+            'submitted': time.time(),
+            'done': threading.Event(),
+        }
+        with self._lock:
+            self.jobs[job['id']] = job
+            self._prune()
+            snapshot = self._snapshot(job)
+        self.queue.put(job['id'])
+        logging.info(f"Queued job {job['id']} for {url}")
+        return snapshot
+    
+    def describe(self, job_id):
+        """Return a JSON-serialisable snapshot of a job, or None if unknown"""
+        with self._lock:
+            job = self.jobs.get(job_id)
+            return None if job is None else self._snapshot(job)
+    
+    def wait(self, job_id, timeout):
+        """Wait for a job to finish and return its snapshot
+
+        Returns None if the job is unknown, or was pruned from the table
+        while waiting.
+        """
+        with self._lock:
+            job = self.jobs.get(job_id)
+        if job is None:
+            return None
+        job['done'].wait(timeout)
+        return self.describe(job_id)
+    
+    @staticmethod
+    def _snapshot(job):
+        return {key: value for key, value in job.items() if key != 'done'}
+    
+    def _prune(self):
+        # Forget the oldest finished jobs so the table does not grow forever
+        finished = [job_id for job_id, job in self.jobs.items() if job['done'].is_set()]
+        for job_id in finished[:max(0, len(finished) - self.MAX_FINISHED_JOBS)]:
+            del self.jobs[job_id]
+    
+    def _update(self, job_id, **fields):
+        with self._lock:
+            self.jobs[job_id].update(fields)
+    
+    def _worker(self):
+        while True:
+            job_id = self.queue.get()
+            with self._lock:
+                job = self.jobs[job_id]
+            self._update(job_id, status='running')
+            try:
+                video_info = self.fetch(job['url'])
+                success, message = write_entry(video_info, self.filename, index=self.index, store=self.store)
+                entry = self.index.read_entry(video_info.video_id) if success else None
+                self._update(job_id, status='done' if success else 'failed', message=message, entry=entry)
+            except Exception as e:
+                log_exception(e)
+                self._update(job_id, status='failed', message=str(e))
+            finally:
+                job['done'].set()
+                self.queue.task_done()
+
+def make_http_server(notes, host='127.0.0.1', port=8765, socket_path=None, wait_timeout=120, allowed_origins=()):
+    """Build the HTTP server for the serve command, on TCP or a Unix socket
+
+    The API has no authentication, so browsers may only use it from
+    allowed_origins (such as https://www.youtube.com for a bookmarklet).
+    Requests from any other web page are refused, so a page open in the
+    browser cannot add entries to the notes. http.server is imported here
+    rather than at module level so that the normal add path does not pay
+    for it at start-up.
+    """
+    import socketserver
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    
+    class NotesRequestHandler(BaseHTTPRequestHandler):
+        """Small JSON API for the serve command
+
+        POST /jobs        {"url": "...", "wait": false} or a plain-text URL
+        GET  /jobs/<id>   status of a job, with the rendered entry once done
+        GET  /health      liveness check
+        """
+        
+        server_version = "YouTubeNotes/1.0"
+        
+        def _origin_allowed(self):
+            # Browsers send Origin with cross-origin requests; curl and scripts do not
+            origin = self.headers.get('Origin')
+            return origin is None or origin in self.server.allowed_origins
+        
+        def _send_cors_headers(self):
+            origin = self.headers.get('Origin')
+            if origin is not None and origin in self.server.allowed_origins:
+                self.send_header('Access-Control-Allow-Origin', origin)
+                self.send_header('Vary', 'Origin')
+        
+        def _send_json(self, status, payload):
+            body = json.dumps(payload).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self._send_cors_headers()
+            self.end_headers()
+            self.wfile.write(body)
+        
+        def do_OPTIONS(self):
+            if not self._origin_allowed():
+                self._send_json(403, {'error': 'origin not allowed'})
+                return
+            self.send_response(204)
+            self._send_cors_headers()
+            self.send_header('Access-Control-Allow-Methods', 'GET, POST, OPTIONS')
+            self.send_header('Access-Control-Allow-Headers', 'Content-Type')
+            self.end_headers()
+        
+        def do_GET(self):
+            if not self._origin_allowed():
+                self._send_json(403, {'error': 'origin not allowed'})
+                return
+            notes = self.server.notes
+            path = urlparse(self.path).path
+            if path == '/health':
+                self._send_json(200, {'status': 'ok', 'queued': notes.queue.qsize()})
+            elif path.startswith('/jobs/'):
+                job = notes.describe(path[len('/jobs/'):])
+                if job is None:
+                    self._send_json(404, {'error': 'unknown job'})
+                else:
+                    self._send_json(200, job)
+            else:
+                self._send_json(404, {'error': 'not found'})
+        
+        def do_POST(self):
+            if not self._origin_allowed():
+                self._send_json(403, {'error': 'origin not allowed'})
+                return
+            notes = self.server.notes
+            parsed = urlparse(self.path)
+            if parsed.path != '/jobs':
+                self._send_json(404, {'error': 'not found'})
+                return
+            
+            length = int(self.headers.get('Content-Length') or 0)
+            body = self.rfile.read(length).decode('utf-8')
+            wait = parse_qs(parsed.query).get('wait', ['0'])[0] not in ('0', 'false', '')
+            try:
+                if self.headers.get('Content-Type', '').startswith('application/json'):
+                    request = json.loads(body)
+                    url = request['url']
+                    wait = bool(request.get('wait', wait))
+                else:
+                    url = body.strip()
+            except (ValueError, KeyError, TypeError):
+                self._send_json(400, {'error': 'expected {"url": ...} or a plain-text URL'})
+                return
+            if not isinstance(url, str) or not url.strip():
+                self._send_json(400, {'error': 'missing url'})
+                return
+            video_id = parse_video_id(url)
+            if video_id is None:
+                self._send_json(400, {'error': 'not a YouTube video URL'})
+                return
+            
+            job = notes.submit(f"https://www.youtube.com/watch?v={video_id}")
+            if wait:
+                job_id = job['id']
+                job = notes.wait(job_id, self.server.wait_timeout)
+                if job is None:
+                    # Pruned from the job table by a burst of later submissions
+                    self._send_json(404, {'error': 'unknown job', 'id': job_id})
+                    return
+                # 202 only while the job is still queued or running
+                status = {'done': 200, 'failed': 502}.get(job['status'], 202)
+                self._send_json(status, job)
+            else:
+                self._send_json(202, job)
+        
+        def address_string(self):
+            # Unix socket clients have no address
+            return self.client_address[0] if self.client_address else 'unix-socket'
+        
+        def log_message(self, format, *args):
+            logging.debug(f"{self.address_string()} - {format % args}")
+
+    class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+        """ThreadingHTTPServer equivalent listening on a Unix socket"""
+        daemon_threads = True
+        
+        def server_bind(self):
+            socketserver.UnixStreamServer.server_bind(self)
+            self.server_name, self.server_port = 'localhost', 0
+        
+    if socket_path:
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        server = UnixHTTPServer(socket_path, NotesRequestHandler)
+    else:
+        server = ThreadingHTTPServer((host, port), NotesRequestHandler)
+    server.notes = notes
+    server.wait_timeout = wait_timeout
+    server.allowed_origins = frozenset(allowed_origins)
+    return server
+
+def serve(fetch, index, filename="AINotesDump.md", host='127.0.0.1', port=8765, socket_path=None,
+          workers=2, wait_timeout=120, store=None, allowed_origins=()):
+    """Run the notes daemon until interrupted"""
+    notes = NotesServer(fetch, index, filename=filename, workers=workers, store=store)
+    server = make_http_server(notes, host=host, port=port, socket_path=socket_path, wait_timeout=wait_timeout,
+                              allowed_origins=allowed_origins)
+    address = f"unix:{socket_path}" if socket_path else f"http://{host}:{server.server_port}"
+    
+    logging.info(f"Serving on {address} with {workers} workers (Ctrl-C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logging.info("Shutting down")
+    finally:
+        server.server_close()
+        if socket_path and os.path.exists(socket_path):
+            os.unlink(socket_path)
+
+COMMANDS = ('add', 'serve', 'sync', 'render', 'import', 'repair', 'install')
+
+def parse_args(argv=None):
+    """Parse command line arguments
+
+    The command defaults to 'add', so `youtube_notes_fixed.py URL` and
+    `youtube_notes_fixed.py --batch FILE` keep working.
+    """
+    argv = sys.argv[1:] if argv is None else list(argv)
+    if not argv or (argv[0] not in COMMANDS and argv[0] not in ('-h', '--help')):
+        argv = ['add'] + argv
+    
+    # Options shared by every command
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--workers', type=int, default=4,
+                        help="Number of concurrent fetches (default: 4)")
+    common.add_argument('--adaptive', action='store_true',
+                        help="Adjust the number of concurrent extractions to the observed latency and "
+                             "throttling, starting from --workers")
+    common.add_argument('--max-workers', type=int, default=DEFAULT_MAX_WORKERS,
+                        help=f"Upper bound for --adaptive (default: {DEFAULT_MAX_WORKERS})")
+    common.add_argument('--backend', choices=BACKENDS, default='yt-dlp',
+                        help="Where video information comes from: yt-dlp (default), the YouTube Data API v3 "
+                             "(api, needs --api-key or YOUTUBE_API_KEY), the oEmbed endpoint and watch page "
+                             "(watch-page), pytube, or auto to use the fastest healthy one")
+    common.add_argument('--hedge', action='store_true',
+                        help="When a fetch is slower than usual, race it against --hedge-backend")
+    common.add_argument('--hedge-backend', choices=('watch-page', 'pytube'), default='watch-page',
+                        help="Alternate backend for --hedge (default: watch-page)")
+    common.add_argument('--hedge-percentile', type=float, default=DEFAULT_HEDGE_PERCENTILE, metavar='P',
+                        help=f"Hedge fetches slower than this percentile of recent ones (default: "
+                             f"{DEFAULT_HEDGE_PERCENTILE})")
+    common.add_argument('--hedge-after', type=float, default=DEFAULT_HEDGE_AFTER, metavar='SECONDS',
+                        help=f"Hedging deadline until enough latencies are known (default: {DEFAULT_HEDGE_AFTER})")
+    common.add_argument('--api-key', default=os.environ.get('YOUTUBE_API_KEY'),
+                        help="YouTube Data API key (default: $YOUTUBE_API_KEY)")
+    common.add_argument('--api-url', default=DATA_API_URL,
+                        help="Data API base URL, e.g. a local stand-in server")
+    common.add_argument('--api-quota', type=int, default=DATA_API_DAILY_QUOTA, metavar='UNITS',
+                        help=f"Daily Data API quota to stay within (default: {DATA_API_DAILY_QUOTA})")
+    common.add_argument('--quota-file', default=QUOTA_FILE,
+                        help=f"Where Data API quota usage is counted (default: {QUOTA_FILE})")
+    common.add_argument('--no-reuse', dest='reuse_extractor', action='store_false',
+                        help="Create a new yt-dlp instance for every video instead of one per worker")
+    common.add_argument('--profile', choices=sorted(EXTRACTION_PROFILES), default=DEFAULT_PROFILE,
+                        help=f"yt-dlp extraction profile (default: {DEFAULT_PROFILE})")
+    common.add_argument('--cache-file', default=CACHE_FILE,
+                        help=f"SQLite metadata cache (default: {CACHE_FILE})")
+    common.add_argument('--cache-ttl', type=float, default=DEFAULT_CACHE_TTL_HOURS, metavar='HOURS',
+                        help=f"How long cached static video information (title, channel, description...) "
+                             f"stays valid (default: {DEFAULT_CACHE_TTL_HOURS})")
+    common.add_argument('--stats-ttl', type=float, default=DEFAULT_STATS_TTL_HOURS, metavar='HOURS',
+                        help=f"How long cached views, likes, comments and subscriber counts stay valid "
+                             f"(default: {DEFAULT_STATS_TTL_HOURS})")
+    common.add_argument('--no-cache', dest='use_cache', action='store_false',
+                        help="Do not read or write the metadata cache")
+    common.add_argument('--refresh', action='store_true',
+                        help="Ignore cached information and fetch again (the cache is still updated)")
+    common.add_argument('--offline', action='store_true',
+                        help="Only use cached information, never contact YouTube")
+    common.add_argument('--retries', type=int, default=DEFAULT_RETRIES,
+                        help=f"Retries for timeouts, server errors and throttling (default: {DEFAULT_RETRIES})")
+    common.add_argument('--backoff', type=float, default=DEFAULT_BACKOFF, metavar='SECONDS',
+                        help=f"Base delay of the exponential backoff between retries (default: {DEFAULT_BACKOFF})")
+    common.add_argument('--output', default="AINotesDump.md",
+                        help="Notes file to append to (default: AINotesDump.md)")
+    common.add_argument('--store', default=STORE_FILE, metavar='FILE',
+                        help=f"Record store the notes file is rendered from (default: {STORE_FILE})")
+    
+    parser = argparse.ArgumentParser(description="Append YouTube video notes to AINotesDump.md")
+    subparsers = parser.add_subparsers(dest='command')
+    
+    add = subparsers.add_parser('add', parents=[common], help="Add one URL or a batch of URLs (default)")
+    add.add_argument('url', nargs='?', help="YouTube video URL")
+    add.add_argument('--batch', metavar='FILE',
+                     help="Read URLs from FILE (one per line, '-' for stdin) and process them all")
+    add.add_argument('--async', dest='use_async', action='store_true',
+                     help="With --batch, use the asyncio engine with per-host rate limiting and timeouts")
+    add.add_argument('--rate', type=float, default=DEFAULT_HOST_RATE,
+                     help=f"With --async, requests per second allowed per remote host (default: {DEFAULT_HOST_RATE:g})")
+    add.add_argument('--burst', type=int, default=DEFAULT_HOST_BURST,
+                     help=f"With --async, requests allowed in a burst per host (default: {DEFAULT_HOST_BURST})")
+    add.add_argument('--timeout', type=float, default=DEFAULT_FETCH_TIMEOUT,
+                     help=f"With --async, seconds before a single video is given up (default: {DEFAULT_FETCH_TIMEOUT})")
+    add.add_argument('--journal', metavar='FILE',
+                     help=f"Progress journal for batches (default: the batch file name plus .journal, "
+                          f"or {BATCH_JOURNAL_FILE})")
+    add.add_argument('--resume', action='store_true',
+                     help="Continue an interrupted batch: skip URLs its journal has as written")
+    add.add_argument('--benchmark', action='store_true',
+                     help="With --batch, compare wall time and bytes transferred for every "
+                          "extraction profile instead of writing notes")
+    add.add_argument('--refresh-stats', action='store_true',
+                     help="Refresh the expired statistics of every cached video and exit")
+    
+    serve_parser = subparsers.add_parser('serve', parents=[common],
+                                         help="Keep a warm process running and accept URLs over HTTP")
+    serve_parser.add_argument('--host', default='127.0.0.1', help="Address to listen on (default: 127.0.0.1)")
+    serve_parser.add_argument('--port', type=int, default=8765, help="Port to listen on (default: 8765)")
+    serve_parser.add_argument('--socket', dest='socket_path', metavar='PATH',
+                              help="Listen on a Unix socket instead of TCP")
+    serve_parser.add_argument('--allow-origin', dest='allowed_origins', action='append', default=[], metavar='ORIGIN',
+                              help="Let web pages from ORIGIN (e.g. https://www.youtube.com, for a bookmarklet) "
+                                   "use the API; can be repeated. Other web pages are refused")
+    
+    sync_parser = subparsers.add_parser('sync', parents=[common],
+                                        help="Add new uploads of followed channels since the last sync")
+    sync_parser.add_argument('channels', nargs='*', metavar='CHANNEL',
+                             help="Channel URLs or @handles to follow (default: every followed channel)")
+    sync_parser.add_argument('--channels-file', metavar='FILE',
+                             help="Read more channel URLs from FILE (one per line)")
+    sync_parser.add_argument('--state', default=SYNC_STATE_FILE,
+                             help=f"Where the per-channel high-water marks are kept (default: {SYNC_STATE_FILE})")
+    sync_parser.add_argument('--limit', type=int, default=DEFAULT_SYNC_LIMIT,
+                             help=f"Most new uploads taken per channel and run (default: {DEFAULT_SYNC_LIMIT})")
+    sync_parser.add_argument('--initial', type=int, default=0,
+                             help="Uploads to add when a channel is synced for the first time (default: 0)")
+    
+    subparsers.add_parser('render', parents=[common],
+                          help="Render the notes file again from the record store, without fetching anything")
+    subparsers.add_parser('import', parents=[common],
+                          help="Add the entries of an existing notes file to the record store")
+    subparsers.add_parser('repair', parents=[common],
+                          help="Fetch the videos whose entries have Unknown fields again and fix their Quick Facts")
+    
+    subparsers.add_parser('install', help="Install the required dependencies with pip")
+    
+    args = parser.parse_args(argv)
+    if args.command == 'install':
+        return args
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+    if args.adaptive and args.max_workers < args.workers:
+        parser.error("--max-workers cannot be lower than --workers")
+    # With --adaptive the pools are sized for the upper bound and the
+    # limiter decides how many of their threads extract at once
+    args.pool_workers = args.max_workers if args.adaptive else args.workers
+    if args.backend == 'api' and not args.api_key:
+        parser.error("--backend api needs --api-key or the YOUTUBE_API_KEY environment variable")
+    if args.hedge and (not 0 < args.hedge_percentile < 100 or args.hedge_after < 0):
+        parser.error("--hedge-percentile must be between 0 and 100 and --hedge-after cannot be negative")
+    if args.hedge and args.hedge_backend == args.backend:
+        parser.error("--hedge-backend must differ from --backend")
+    if args.retries < 0 or args.backoff < 0:
+        parser.error("--retries and --backoff cannot be negative")
+    if args.offline and (args.refresh or not args.use_cache):
+        parser.error("--offline needs the cache and cannot be combined with --refresh or --no-cache")
+    if args.command == 'sync' and (args.limit < 1 or args.initial < 0):
+        parser.error("--limit must be at least 1 and --initial cannot be negative")
+    if getattr(args, 'use_async', False) and (args.rate <= 0 or args.burst < 1 or args.timeout <= 0):
+        parser.error("--rate and --timeout must be positive and --burst at least 1")
+    if getattr(args, 'refresh_stats', False) and (args.offline or not args.use_cache):
+        parser.error("--refresh-stats needs the cache and network access")
+    return args
+
+@contextlib.contextmanager
+def open_pipeline(args):
+    """Open the metadata cache, notes index and extractor session for a run
+
+    Yields (fetch, index, cache, retry, prefetch, store). fetch is
+    fetch_video_info with the run's options bound, behind a SingleFlight so
+    concurrent requests for one video share a fetch, and retry is its
+    RetryPolicy. prefetch passes a stream of URLs through, fetching them
+    ahead in bulk where the backend supports it. Dependencies are checked
+    lazily, on the first cache miss.
+    """
+    cache = None
+    if args.use_cache:
+        cache = MetadataCache(args.cache_file, ttl_hours=args.cache_ttl, stats_ttl_hours=args.stats_ttl)
+    index = NotesIndex(args.output)
+    store = RecordStore(args.store)
+    # One breaker for the whole run, so throttling pauses every worker
+    limiter = AdaptiveConcurrency(args.workers, maximum=args.max_workers) if args.adaptive else None
+    retry = RetryPolicy(retries=args.retries, base_delay=args.backoff, breaker=CircuitBreaker(), limiter=limiter)
+    session = api = quota = None
+    names = AUTO_BACKENDS if args.backend == 'auto' else (args.backend,)
+    backends = {}
+    if 'api' in names and args.api_key:
+        quota = QuotaLedger(args.quota_file, daily_limit=args.api_quota)
+        api = backends['api'] = DataAPIBackend(args.api_key, base_url=args.api_url, quota=quota, retry=retry)
+    if 'yt-dlp' in names and (args.backend == 'yt-dlp' or importlib.util.find_spec('yt_dlp')):
+        session = ExtractorSession(profile=args.profile) if args.reuse_extractor else None
+        backends['yt-dlp'] = YtDlpBackend(session=session, profile=args.profile, retry=retry)
+    if 'watch-page' in names:
+        backends['watch-page'] = WatchPageBackend(retry=retry)
+    if 'pytube' in names and (args.backend == 'pytube' or importlib.util.find_spec('pytube')):
+        backends['pytube'] = PytubeBackend(retry=retry)
+    if args.backend == 'auto':
+        backend = BackendSelector([backends[name] for name in AUTO_BACKENDS if name in backends])
+        logging.info(f"Selecting between the {', '.join(b.name for b in backend.backends)} backends")
+    else:
+        backend = backends[args.backend]
+    hedged = None
+    if args.hedge:
+        alternate = backends.get(args.hedge_backend)
+        if alternate is None:
+            alternate = {'watch-page': WatchPageBackend, 'pytube': PytubeBackend}[args.hedge_backend](retry=retry)
+        hedged = backend = HedgedBackend(
+            backend, alternate, percentile=args.hedge_percentile, initial_delay=args.hedge_after,
+            samples=cache.recent_latencies(backend.name) if cache is not None else (),
+            on_sample=functools.partial(cache.record_latency, backend.name) if cache is not None else None,
+            workers=args.pool_workers,
+        )
+    fetch = SingleFlight(functools.partial(fetch_video_info, cache=cache, refresh=args.refresh,
+                                           offline=args.offline, backend=backend))
+    
+    def prefetch(urls):
+        # Only worth the quota when the Data API answers the fetches
+        if args.backend != 'api' or args.offline:
+            return urls
+        return api.prefetch(urls, cache=None if args.refresh else cache)
+    
+    try:
+        yield fetch, index, cache, retry, prefetch, store
+    finally:
+        if hedged is not None:
+            hedged.close()
+            backend = hedged.primary
+        if isinstance(backend, BackendSelector):
+            backend.log_summary()
+        if session is not None:
+            session.close()
+        if quota is not None:
+            logging.info(f"Data API quota used today: {quota.used()}/{quota.daily_limit} units")
+            quota.close()
+        index.close()
+        store.close()
+        if cache is not None:
+            cache.close()
+
+def run_add(args):
+    if args.batch and args.benchmark:
+        if not require_dependencies():
+            return
+        benchmark_profiles(read_urls(args.batch), profiles=sorted(EXTRACTION_PROFILES))
+        return
+    
+    with open_pipeline(args) as (fetch, index, cache, retry, prefetch, store):
+        if args.refresh_stats:
+            refresh_cached_stats(cache, workers=args.workers)
+            return
+        
+        if args.batch:
+            urls = read_urls(args.batch)
+        else:
+            # Get YouTube URL from command line or input
+            if args.url:
+                url = args.url
+                logging.info(f"URL provided as command line argument: {url}")
+            else:
+                url = input("Enter YouTube URL: ").strip()
+                logging.info(f"URL provided via input prompt: {url}")
+            if parse_video_id(url) is None and collection_url(url) is None:
+                logging.error(f"Not a YouTube video, playlist or channel URL: {url}")
+                return
+            urls = [url]
+        
+        if args.batch or collection_url(url):
+            journal_path = args.journal
+            if journal_path is None:
+                journal_path = f"{args.batch}.journal" if args.batch and args.batch != '-' else BATCH_JOURNAL_FILE
+            
+            # Garbage and duplicates are dropped up front, then playlists and
+            # channels are expanded lazily into their videos
+            urls = prefetch(expand_urls(normalize_urls(urls)))
+            with JobJournal(journal_path, resume=args.resume) as journal:
+                if args.use_async:
+                    results = process_batch_async(urls, fetch, cache=cache, index=index, filename=args.output,
+                                                  concurrency=args.pool_workers, rate=args.rate, burst=args.burst,
+                                                  timeout=args.timeout, journal=journal, store=store)
+                else:
+                    results = process_batch(urls, fetch, workers=args.pool_workers, filename=args.output,
+                                            index=index, journal=journal, store=store)
+            log_batch_summary(results, retry)
+            return
+        
+        logging.info(f"Processing video: {url}")
+        
+        # Get video information, then format and append it
+        video_info = fetch(url)
+        write_entry(video_info, args.output, index=index, store=store)
+
+def run_sync(args):
+    with ChannelSyncState(args.state) as state:
+        for channel in args.channels + (read_urls(args.channels_file) if args.channels_file else []):
+            channel_url = collection_url(channel)
+            if channel_url is None:
+                logging.error(f"Not a channel URL: {channel}")
+                continue
+            state.follow(channel_url)
+        
+        channels = state.channels()
+        if not channels:
+            logging.error("No channels to sync. Pass channel URLs or @handles to follow them")
+            return
+        if args.offline or not require_dependencies():
+            logging.error("Syncing channels needs network access")
+            return
+        
+        logging.info(f"Syncing {len(channels)} channels")
+        results = []
+        # One pool for every channel, so each worker thread keeps its yt-dlp instance
+        with open_pipeline(args) as (fetch, index, cache, retry, prefetch, store), \
+                ThreadPoolExecutor(max_workers=args.pool_workers) as executor:
+            def process(urls):
+                failures = {}
+                results = process_batch(prefetch(urls), fetch, workers=args.pool_workers, filename=args.output,
+                                        index=index, store=store, executor=executor, failures=failures)
+                return results, failures
+            
+            for channel_url in channels:
+                try:
+                    results += sync_channel(channel_url, state, process, limit=args.limit, initial=args.initial)
+                except Exception as e:
+                    logging.error(f"Failed to sync {channel_url}: {e}")
+                    log_exception(e)
+            log_batch_summary(results, retry)
+
+def run_serve(args):
+    with open_pipeline(args) as (fetch, index, cache, retry, prefetch, store):
+        # Pay the import cost once, before the first request arrives
+        if args.backend == 'yt-dlp' and not args.offline:
+            if not require_dependencies():
+                return
+            import yt_dlp  # noqa: F401
+        serve(fetch, index, filename=args.output, host=args.host, port=args.port,
+              socket_path=args.socket_path, workers=args.pool_workers, store=store,
+              allowed_origins=args.allowed_origins)
+
+def run_render(args):
+    if not os.path.exists(args.store):
+        logging.error(f"No record store at {args.store}")
+        return
+    with RecordStore(args.store) as store, NotesIndex(args.output) as index:
+        logging.info(f"Rendering {len(store)} records into {args.output}")
+        regenerate_notes(store, args.output, index=index)
+
+def run_import(args):
+    if not os.path.exists(args.output):
+        logging.error(f"No notes file at {args.output}")
+        return
+    with RecordStore(args.store) as store:
+        import_notes(store, args.output)
+
+def run_repair(args):
+    if not os.path.exists(args.output):
+        logging.error(f"No notes file at {args.output}")
+        return
+    with open_pipeline(args) as (fetch, index, cache, retry, prefetch, store):
+        results = repair_notes(fetch, args.output, index=index, workers=args.pool_workers, prefetch=prefetch,
+                               store=store)
+        log_batch_summary(results, retry)
+
+def main(argv=None):
+    setup_logging()
+    logging.info("=== Starting YouTube Notes Generator ===")
+    args = parse_args(argv)
+    
+    if args.command == 'install':
+        if not install_dependencies():
+            sys.exit(1)
+    elif args.command == 'serve':
+        run_serve(args)
+    elif args.command == 'sync':
+        run_sync(args)
+    elif args.command == 'render':
+        run_render(args)
+    elif args.command == 'import':
+        run_import(args)
+    elif args.command == 'repair':
+        run_repair(args)
+    else:
+        run_add(args)
     logging.info("=== Script execution completed ===")
 
 if __name__ == "__main__":
@@ -273,4 +3920,4 @@ if __name__ == "__main__":
     except Exception as e:
         logging.critical("Unhandled exception in main")
         log_exception(e)
-        sys.exit(1) 
\ No newline at end of file
+        sys.exit(1)